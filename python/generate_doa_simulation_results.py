@@ -1,25 +1,35 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-from copy import deepcopy
 import itertools
 import os
 import sys
+from functools import partial
+from multiprocessing import Pool
 
 import numpy as np
+from scipy.fft import rfft
 
 from utils.algos_basics import get_mic_delays_near, get_mic_delays
 from utils.constants import SPEED_OF_SOUND
 from utils.signals import generate_signal_mono
 
-from audio_stack.beam_former import rotate_mics
-from audio_stack.beam_former import BeamFormer
+from audio_stack.beam_former import rotate_mics_batch
+from audio_stack.beam_former import BeamFormer, LAMDA
+from audio_stack.numba_helpers import njit, prange, set_num_threads
 from crazyflie_description_py.parameters import N_BUFFER, FS
 
 DURATION = 7  # seconds, should be long enough to account for delays
 COMBINATION_METHOD = "sum"  # can be sum or product
 NORMALIZATION_METHOD = "none"  # zero_to_one, zero_to_one_all, sum_to_one
 METHOD = "mvdr"
+# precision of the simulated buffers and of their fft. np.float32 halves the memory
+# traffic and gives the same DAS peaks, but it changes the MVDR results, because
+# the regularization LAMDA is below the resolution of single precision.
+SIGNAL_DTYPE = np.float64
+# fraction of steering dictionary energy to keep, e.g. 0.99 for a low-rank
+# approximation. With 1, the dense dictionary is used.
+STEERING_ENERGY = 1.0
 
 GT_DISTANCE = 1  # meters, distance of source
 SAMPLING_TIME = 0.5  # sampling time in sconds
@@ -71,12 +81,10 @@ def generate_signals_pyroom(
             f"sampling time error: have {start_idx / FS} want {time} error {(start_idx / FS) - time}"
         )
 
-    signals = deepcopy(room.mic_array.signals)
+    signals = room.mic_array.signals[:, start_idx:].copy()
     if noise > 0:
         signals += np.random.normal(scale=noise, size=signals.shape)
 
-    signals = signals[:, start_idx:]
-
     if ax is not None:
         for i in range(signals.shape[0]):
             ax.plot(signals[i], label=f"mic{i}", color=f"C{i}")
@@ -92,16 +100,30 @@ def generate_signals_analytical(
     ax=None,
     phase_offset=0,
     farfield=False,
+    start_sample=0,
+    n_samples_out=None,
 ):
     """
     :param mics_rotated: shape n_mics x 2
+    :param time: start time of recording, scalar or of shape n_mics (one per mic).
+    :param start_sample: index of first sample to return, relative to time.
+    :param n_samples_out: number of samples to return, defaults to DURATION * FS.
     """
     # add multiple sources by superposition
     if type(source) == list:
         signals = None
         for s, p in zip(source, phase_offset):
             new_signal = generate_signals_analytical(
-                s, mics_rotated, frequency_hz, time, noise, ax, p, farfield
+                s,
+                mics_rotated,
+                frequency_hz,
+                time,
+                noise,
+                ax,
+                p,
+                farfield,
+                start_sample=start_sample,
+                n_samples_out=n_samples_out,
             )
             if signals is None:
                 signals = new_signal
@@ -116,10 +138,16 @@ def generate_signals_analytical(
         delays_relative = get_mic_delays_near(mics_rotated, source)
     delays = np.linalg.norm(mics_rotated[0] - source) / SPEED_OF_SOUND + delays_relative
 
-    times = np.arange(time, time + DURATION, step=1 / FS)  # n_times
-    signals = np.sin(
-        2 * np.pi * frequency_hz * (times[None, :] - delays[:, None]) + phase_offset
-    )  # n_mics x n_times
+    if n_samples_out is None:
+        n_samples_out = int(round(DURATION * FS))
+
+    # only evaluate the samples that are actually requested.
+    times = (
+        np.reshape(time, (-1, 1)) + (start_sample + np.arange(n_samples_out)) / FS
+    )  # n_mics (or 1) x n_times
+    # the phases need double precision, the signals themselves do not.
+    phases = 2 * np.pi * frequency_hz * (times - delays[:, None]) + phase_offset
+    signals = np.sin(phases).astype(SIGNAL_DTYPE)  # n_mics x n_times
     # signals[times[None, :] < delays[:, None]] = 0.0
 
     if noise > 0:
@@ -132,12 +160,10 @@ def generate_signals_analytical(
 
 
 def from_0_to_2pi(angle):
-    angle = (angle + np.pi) % (2 * np.pi) - np.pi  # -pi to pi
-    if (type(angle) == float) or (angle.ndim == 0):
-        angle = angle + 2 * np.pi if angle <= 0 else angle
-    else:
-        angle[angle <= 0] += 2 * np.pi
-    return angle
+    """ Wrap angle(s) to (0, 2pi], works for scalars, lists and arrays. """
+    angle = (np.asarray(angle) + np.pi) % (2 * np.pi) - np.pi  # -pi to pi
+    angle = np.where(angle <= 0, angle + 2 * np.pi, angle)
+    return angle[()]  # unpack 0-dimensional arrays to scalars
 
 
 def from_0_to_360(angle_deg):
@@ -145,21 +171,24 @@ def from_0_to_360(angle_deg):
 
 
 def move_mics(mics_local, degrees, offsets, noise_dict={}):
-    mics_list = []
-    for degree, offset in zip(degrees, offsets):
-        degree_noise = noise_dict.get("degree", 0)
-        offset_noise = noise_dict.get("offset", 0)
+    """
+    :return: moved mic positions (n_positions x n_mics x 2)
+    """
+    degrees_noisy = np.array(degrees, dtype=float)
+    offsets_noisy = np.array(offsets, dtype=float)
+    degree_noise = noise_dict.get("degree", 0)
+    offset_noise = noise_dict.get("offset", 0)
+    for i in range(len(degrees_noisy)):
         if degree_noise > 0:
-            degree += np.random.normal(scale=degree_noise)
+            degrees_noisy[i] += np.random.normal(scale=degree_noise)
         if offset_noise > 0:
             assert offset_noise < 1, "make sure offset noise is in m and below 1"
-            offset += np.random.normal(scale=offset_noise)
-        # import pudb; pudb.set_trace()
-        mics_list.append(
-            rotate_mics(mics_local, orientation_deg=degree)
-            + np.array([offset, 0])[None, :]
-        )
-    return mics_list
+            offsets_noisy[i] += np.random.normal(scale=offset_noise)
+
+    # rotate for all positions at once.
+    mics = rotate_mics_batch(mics_local, degrees_noisy)
+    mics[:, :, 0] += offsets_noisy[:, None]
+    return mics
 
 
 def get_source(angle_rad, source_distance=1, degrees=False):
@@ -169,7 +198,6 @@ def get_source(angle_rad, source_distance=1, degrees=False):
         return source_distance * np.array((np.cos(angle_rad), np.sin(angle_rad)))
     else:
         if degrees:
-            angle_rad = deepcopy(angle_rad)
             angle_rad = np.array(angle_rad) / 180 * np.pi
         return [get_source(a) for a in angle_rad]
 
@@ -184,7 +212,6 @@ def get_movement(angular_velocity_deg, linear_velocity_cm, n_samples, sampling_t
 
 
 def get_noisy_times(time_list, time_noise, time_quantization=6):
-    time_list_noisy = deepcopy(time_list)
     time_list_noisy = time_list + np.random.normal(
         scale=time_noise, size=time_list.shape
     )
@@ -193,6 +220,133 @@ def get_noisy_times(time_list, time_noise, time_quantization=6):
     return time_list_noisy
 
 
+def get_delays(mic_positions, theta_scan):
+    """
+    :param mic_positions: mic positions (n_mics x 2)
+    :param theta_scan: candidate angles in rad (n_angles)
+
+    :return: delays w.r.t. first mic for each candidate angle (n_angles x n_mics)
+    """
+    directions = np.c_[np.cos(theta_scan), np.sin(theta_scan)]  # n_angles x 2
+    return directions @ (mic_positions[0] - mic_positions).T / SPEED_OF_SOUND
+
+
+def get_steering_dictionary(mic_positions, frequencies, energy=STEERING_ENERGY):
+    """ Get the DAS steering vectors for all candidate angles of BeamFormer.theta_scan.
+
+    If energy is below 1, the dictionary W of shape (n_frequencies x n_angles x
+    n_mics) is approximated by U @ SV, using the K leading singular values that
+    keep at least the given fraction of its energy at every frequency.
+
+    :param mic_positions: mic positions (n_mics x 2)
+    :param frequencies: list of frequencies (in Hz)
+    :param energy: fraction of energy to keep, set to 1 to use the dense dictionary.
+
+    :return: U of shape (n_frequencies x n_angles x K) and SV of shape
+    (n_frequencies x K x n_mics), or W and None if energy is 1.
+    """
+    delays = get_delays(mic_positions, BeamFormer.theta_scan)
+    frequencies = np.asarray(frequencies, dtype=float)
+    W = np.exp(-2j * np.pi * frequencies[:, None, None] * delays[None, :, :])
+    if energy >= 1:
+        # keeping all singular values gives K = n_mics, which saves nothing.
+        return W, None
+
+    U, S, Vh = np.linalg.svd(W, full_matrices=False)
+    energies = np.cumsum(S ** 2, axis=1) / np.sum(S ** 2, axis=1, keepdims=True)
+    K = max(np.searchsorted(e, energy) + 1 for e in energies)
+    K = min(K, S.shape[1])
+    return (
+        np.ascontiguousarray(U[:, :, :K]),
+        S[:, :K, None] * Vh[:, :K, :],
+    )
+
+
+def get_steering(mics_local, degrees, offsets, frequencies):
+    """ Get the steering dictionaries used by inner_loop.
+
+    They only depend on the noiseless movement and the frequencies, so they can
+    be computed once and reused over all iterations.
+
+    :return: dictionaries for the local and for the moved (multi-mic) array.
+    """
+    mics_array = move_mics(mics_local, degrees, offsets).reshape((-1, 2))
+    return (
+        get_steering_dictionary(mics_local, frequencies),
+        get_steering_dictionary(mics_array, frequencies),
+    )
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def get_quadratic_forms(U, M):
+    """ Evaluate |u^H M u| for all rows u of U.
+
+    :param U: (n_frequencies x n_angles x K)
+    :param M: (n_frequencies x K x K)
+
+    :return: array of shape (n_frequencies x n_angles)
+    """
+    n_frequencies, n_angles = U.shape[0], U.shape[1]
+    forms = np.empty((n_frequencies, n_angles))
+    for i in prange(n_angles):
+        for j in range(n_frequencies):
+            forms[j, i] = np.abs(np.vdot(U[j, i], M[j] @ U[j, i]))
+    return forms
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def get_mvdr_spectrum_fast(R, R_inv, C):
+    """ Same as BeamFormer.get_mvdr_spectrum, but with precomputed steering vectors and inverse.
+
+    :param R: autocorrelation tensor (n_frequencies x n_mics x n_mics)
+    :param R_inv: regularized inverse of R (n_frequencies x n_mics x n_mics)
+    :param C: steering vectors (n_frequencies x n_angles x n_mics)
+
+    :return: spectrum of shape (n_frequencies x n_angles)
+    """
+    n_frequencies, n_angles = C.shape[0], C.shape[1]
+    spectrum = np.empty((n_frequencies, n_angles))
+    for i in prange(n_angles):
+        for j in range(n_frequencies):
+            c = C[j, i]
+            R_inv_c = R_inv[j] @ c
+            h = R_inv_c / np.vdot(c, R_inv_c)
+            spectrum[j, i] = np.abs(np.vdot(h, R[j] @ h))
+    return spectrum
+
+
+def get_spectrum(R, W, method=None, lamda=LAMDA):
+    """ Get spatial spectrum over BeamFormer.theta_scan, using a steering dictionary.
+
+    The DAS spectrum is the quadratic form w^H R w of the steering vectors w,
+    so with a low-rank dictionary, R is first projected to the space of W.
+
+    :param R: autocorrelation tensor (n_frequencies x n_mics x n_mics)
+    :param W: output of get_steering_dictionary.
+    :param method: "mvdr" or "das", defaults to METHOD.
+
+    :return: spectrum of shape (n_frequencies x n_angles)
+    """
+    if method is None:
+        method = METHOD
+    U, SV = W
+    n_mics = R.shape[1]
+    R = np.ascontiguousarray(R, dtype=np.complex128)
+
+    if method == "mvdr":
+        # the inverse does not depend on the angle, so compute it only once.
+        R_inv = np.linalg.pinv(R + lamda * np.eye(n_mics)[None, :, :], rcond=0)
+        C = U if SV is None else np.ascontiguousarray(U @ SV)
+        return get_mvdr_spectrum_fast(R, R_inv, C)
+    elif method == "das":
+        # same as BeamFormer.get_das_spectrum, with h = w / n_mics
+        if SV is None:
+            return get_quadratic_forms(U, R) / n_mics ** 2
+        R_projected = np.ascontiguousarray(SV.conj() @ R @ np.swapaxes(SV, 1, 2))
+        return get_quadratic_forms(U, R_projected) / n_mics ** 2
+    raise ValueError(method)
+
+
 def inner_loop(
     mics_local,
     degrees,
@@ -201,18 +355,22 @@ def inner_loop(
     signals_f_list,
     signals_f_multimic,
     frequencies,
+    steering=None,
 ):
-    mics_clean = move_mics(mics_local, degrees, offsets)
-    mics_array_clean = np.concatenate([*mics_clean])
+    """
+    :param signals_f_list: signals at each position (n_positions x n_frequencies x n_mics)
+    :param signals_f_multimic: signals of all positions (n_frequencies x n_positions * n_mics)
+    :param steering: output of get_steering, computed here if not given.
+    """
+    if steering is None:
+        steering = get_steering(mics_local, degrees, offsets, frequencies)
+    W_local, W_multi = steering
 
     ##################### DOA estimation
     ## multi-mic spectrum
-    beam_former = BeamFormer(mic_positions=mics_array_clean)
+    beam_former = BeamFormer()
     R_multimic = beam_former.get_correlation(signals_f_multimic)
-    if METHOD == "mvdr":
-        spectrum_multimic = beam_former.get_mvdr_spectrum(R_multimic, frequencies)
-    else:
-        spectrum_multimic = beam_former.get_das_spectrum(R_multimic, frequencies)
+    spectrum_multimic = get_spectrum(R_multimic, W_multi)
 
     ## combined spectrum
     beam_former = BeamFormer(mic_positions=mics_local)
@@ -226,16 +384,108 @@ def inner_loop(
     for sig_f, time, degree, offset in zip(
         signals_f_list, times_noisy, degrees, offsets
     ):
-        beam_former.add_signals_to_dynamic_estimates(
-            sig_f, frequencies, degree, method=METHOD
-        )
+        R = beam_former.get_correlation(sig_f)
+        spectrum = get_spectrum(R, W_local)
+        beam_former.add_to_dynamic_estimates(spectrum, degree)
         beam_former.add_to_multi_estimate(sig_f, frequencies, time, degree, offset)
 
     spectrum_dynamic = beam_former.get_dynamic_estimate()
-    spectrum_delayed = beam_former.get_multi_estimate(method=METHOD)
+    # the moved mic positions of the multi estimate are the same as for the multi-mic spectrum.
+    spectrum_delayed = get_spectrum(beam_former.get_multi_R(), W_multi)
     return spectrum_dynamic, spectrum_delayed, spectrum_multimic
 
 
+def simulate_iteration(
+    seed,
+    sources,
+    mics_local,
+    degrees,
+    offsets,
+    times,
+    frequencies,
+    f_idx,
+    steering,
+    degree_noise,
+    offset_noise,
+    time_noise,
+    signal_noise,
+    phase_offsets,
+    start_sample,
+    time_quantization=6,
+):
+    """
+    Run one Monte Carlo iteration of simulate_doa.
+
+    :param seed: random seed of this iteration
+    :param frequencies: the chosen frequency bin (one element)
+    :param f_idx: index of the chosen frequency bin in the buffer's rfft
+    :return: dynamic, delayed and multi-mic spectra, as returned by inner_loop
+    """
+    np.random.seed(seed)
+
+    ##################### generate signals
+    # create noisy versions
+    times_noisy = get_noisy_times(times, time_noise, time_quantization)
+
+    mics_noisy = move_mics(
+        mics_local,
+        degrees,
+        offsets,
+        noise_dict={"degree": degree_noise, "offset": offset_noise},
+    )
+
+    ### generate signals at different positions
+    # all positions are stacked and evaluated in one go, each mic
+    # using the recording time of its position.
+    n_mics = len(mics_local)
+    mics_array_noisy = mics_noisy.reshape((-1, 2))
+    signals_received = generate_signals_analytical(
+        sources,
+        mics_array_noisy,
+        frequencies[0],
+        time=np.repeat(times, n_mics),
+        noise=signal_noise,
+        phase_offset=phase_offsets,
+        start_sample=start_sample,
+        n_samples_out=N_BUFFER,
+    )
+
+    ### generate "real" multi-mic signals
+    buffer_multimic = generate_signals_analytical(
+        sources,
+        mics_array_noisy,
+        frequencies[0],
+        time=0,
+        noise=signal_noise,
+        phase_offset=phase_offsets,
+        start_sample=start_sample,
+        n_samples_out=N_BUFFER,
+    )
+
+    # transform all buffers at once and keep only the chosen bin.
+    # scipy keeps the precision of the buffers (complex64 for float32).
+    signals_f = rfft(np.r_[signals_received, buffer_multimic], axis=-1)
+    signals_f = signals_f[:, f_idx]
+    n_samples = len(degrees)
+    n_total = n_samples * n_mics
+    signals_f_list = signals_f[:n_total].reshape((n_samples, 1, n_mics))
+    signals_f_multimic = signals_f[None, n_total:]
+
+    # print("mics_noisy", mics_noisy)
+    # note that below we use the noiseless quantities for degrees, offsets, and times!
+    # this is because we added the noise for generating the signals themselves.
+    return inner_loop(
+        mics_local,
+        degrees,
+        offsets,
+        times_noisy,
+        signals_f_list,
+        signals_f_multimic,
+        frequencies,
+        steering,
+    )
+
+
 def simulate_doa(
     gt_angle_deg,
     degree_noise_list,
@@ -249,6 +499,7 @@ def simulate_doa(
     angular_velocity_deg_list=[0],  # deg/sec, velocity of drone
     saveas="",
     verbose=False,
+    n_jobs=1,
 ):
     """
     :param degree_noise_list:  noise added to each degree position, in degrees
@@ -257,25 +508,13 @@ def simulate_doa(
     :param n_samples: number of positions to consider
     :param linear_velocity_cm_list:  linear velocity of drone in cm/s
     :param angular_velocity_deg_list:  velocity of drone in deg/sec
+    :param n_jobs: number of processes running the iterations, None to use all cores.
+    The parallel numba kernels run single-threaded inside these processes.
     """
     import progressbar
     from utils.geometry import Context
 
-    df = pd.DataFrame(
-        columns=[
-            "it",
-            "seed",
-            "degree_noise",
-            "offset_noise" "signal_noise",
-            "time_noise",
-            "frequency",
-            "angular_velocity_deg",
-            "linear_velocity_cm",
-            "spectrum_multimic",
-            "spectrum_dynamic",
-            "spectrum_delayed",
-        ]
-    )
+    records = []
 
     # fixed quantitites
     frequencies_all = np.fft.rfftfreq(N_BUFFER, 1 / FS)
@@ -312,44 +551,42 @@ def simulate_doa(
         )
     )
 
-    with progressbar.ProgressBar(max_value=len(combinations) * n_it) as p:
-        for (
-            degree_noise,
-            offset_noise,
-            time_noise,
-            signal_noise,
-            frequency,
-            angular_velocity_deg,
-            linear_velocity_cm,
-        ) in combinations:
-
-            if verbose:
-                print(f"degree noise {degree_noise} of {degree_noise_list}")
-                print(f"lateral noise {offset_noise} of {offset_noise_list}")
-                print(f"time noise {time_noise} of {time_noise_list}")
-                print(f"signal noise {signal_noise} of {signal_noise_list}")
-                print(f"frequency {frequency} of {frequency_list}")
-                print(
-                    f"linear velocity {linear_velocity_cm} of {linear_velocity_cm_list}"
-                )
-                print(
-                    f"angular velocity {angular_velocity_deg} of {angular_velocity_deg_list}"
-                )
-
-            for it in range(n_it):
+    # the iterations are independent, so they can be distributed over processes.
+    # there, the numba kernels use a single thread, to not oversubscribe the cores.
+    if n_jobs == 1:
+        pool = None
+    else:
+        pool = Pool(n_jobs, initializer=set_num_threads, initargs=(1,))
+
+    try:
+        with progressbar.ProgressBar(max_value=len(combinations) * n_it) as p:
+            for (
+                degree_noise,
+                offset_noise,
+                time_noise,
+                signal_noise,
+                frequency,
+                angular_velocity_deg,
+                linear_velocity_cm,
+            ) in combinations:
 
                 if verbose:
-                    print(f"iteration {it + 1}/{n_it}")
-                np.random.seed(seed)
-                p.update(seed)
-                seed += 1
+                    print(f"degree noise {degree_noise} of {degree_noise_list}")
+                    print(f"lateral noise {offset_noise} of {offset_noise_list}")
+                    print(f"time noise {time_noise} of {time_noise_list}")
+                    print(f"signal noise {signal_noise} of {signal_noise_list}")
+                    print(f"frequency {frequency} of {frequency_list}")
+                    print(
+                        f"linear velocity {linear_velocity_cm} of {linear_velocity_cm_list}"
+                    )
+                    print(
+                        f"angular velocity {angular_velocity_deg} of {angular_velocity_deg_list}"
+                    )
 
-                ##################### generate signals
-                # create noisy versions
+                # the noiseless movement and the frequency bin are the same for all iterations.
                 degrees, offsets, times = get_movement(
                     angular_velocity_deg, linear_velocity_cm, n_samples, sampling_time
                 )
-                times_noisy = get_noisy_times(times, time_noise, time_quantization)
 
                 # choose frequency bin (for now we make sure that the source signal is one of the available bins)
                 f_idx = np.argmin(np.abs(frequencies_all - frequency))
@@ -360,75 +597,67 @@ def simulate_doa(
                 if abs(frequency_hz - frequency) > 100:
                     print("Warning: frequency mismatch", frequency_hz, frequency)
 
-                mics_list_noisy = move_mics(
-                    mics_local,
-                    degrees,
-                    offsets,
-                    noise_dict={"degree": degree_noise, "offset": offset_noise},
-                )
-
-                ### generate signals at different positions
-                signals_f_list = []
-                for mics_noisy, time in zip(mics_list_noisy, times):
-                    signals_received = generate_signals_analytical(
-                        sources,
-                        mics_noisy,
-                        frequency_hz,
-                        time,
-                        noise=signal_noise,
-                        phase_offset=phase_offsets,
-                    )
-                    buffer_ = signals_received[:, time_index : time_index + N_BUFFER]
-                    signals_f = np.fft.rfft(buffer_).T
-                    signals_f_list.append(signals_f[[f_idx], :])
-
-                ### generate "real" multi-mic signals
-                mics_array_noisy = np.concatenate([*mics_list_noisy])
-                signals_multimic = generate_signals_analytical(
-                    sources,
-                    mics_array_noisy,
-                    frequency_hz,
-                    time=0,
-                    noise=signal_noise,
-                    phase_offset=phase_offsets,
-                )
-                buffer_multimic = signals_multimic[
-                    :, time_index : time_index + N_BUFFER
-                ]
-                signals_f_multimic = (np.fft.rfft(buffer_multimic).T)[[f_idx], :]
-
-                # print("mics_list_noisy", mics_list_noisy)
-                # note that below we use the noiseless quantities for degrees, offsets, and times!
-                # this is because we added the noise for generating the signals themselves.
-                spectrum_dynamic, spectrum_delayed, spectrum_multimic = inner_loop(
-                    mics_local,
-                    degrees,
-                    offsets,
-                    times_noisy,
-                    signals_f_list,
-                    signals_f_multimic,
-                    frequencies,
-                )
-
-                df.loc[len(df), :] = dict(
-                    it=it,
-                    seed=seed,
+                steering = get_steering(mics_local, degrees, offsets, frequencies)
+
+                simulate = partial(
+                    simulate_iteration,
+                    sources=sources,
+                    mics_local=mics_local,
+                    degrees=degrees,
+                    offsets=offsets,
+                    times=times,
+                    frequencies=frequencies,
+                    f_idx=f_idx,
+                    steering=steering,
                     degree_noise=degree_noise,
-                    offset_nosie=offset_noise,
+                    offset_noise=offset_noise,
                     time_noise=time_noise,
-                    frequency=frequency_hz,
-                    angular_velocity_deg=angular_velocity_deg,
-                    linear_velocity_cm=linear_velocity_cm,
-                    spectrum_dynamic=spectrum_dynamic,
-                    spectrum_delayed=spectrum_delayed,
-                    spectrum_multimic=spectrum_multimic,
+                    signal_noise=signal_noise,
+                    phase_offsets=phase_offsets,
+                    start_sample=time_index,
+                    time_quantization=time_quantization,
                 )
+                seeds = range(seed, seed + n_it)
+                if pool is None:
+                    results = map(simulate, seeds)
+                else:
+                    results = pool.imap(simulate, seeds)
+
+                for it, spectra in enumerate(results):
+                    if verbose:
+                        print(f"iteration {it + 1}/{n_it}")
+                    p.update(seed)
+                    seed += 1
+
+                    spectrum_dynamic, spectrum_delayed, spectrum_multimic = spectra
+
+                    records.append(
+                        dict(
+                            it=it,
+                            seed=seed,
+                            degree_noise=degree_noise,
+                            offset_noise=offset_noise,
+                            signal_noise=signal_noise,
+                            time_noise=time_noise,
+                            frequency=frequency_hz,
+                            angular_velocity_deg=angular_velocity_deg,
+                            linear_velocity_cm=linear_velocity_cm,
+                            spectrum_dynamic=spectrum_dynamic,
+                            spectrum_delayed=spectrum_delayed,
+                            spectrum_multimic=spectrum_multimic,
+                        )
+                    )
 
-            if saveas != "":
-                df.to_pickle(saveas)
-                if verbose:
-                    print(f"saved intermediate to {saveas}")
-        return df
+                if saveas != "":
+                    pd.DataFrame(records).to_pickle(saveas)
+                    if verbose:
+                        print(f"saved intermediate to {saveas}")
+    finally:
+        # also stops the workers if an iteration failed.
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    return pd.DataFrame(records)
 
 
 if __name__ == "__main__":
@@ -527,4 +756,5 @@ if __name__ == "__main__":
         linear_velocity_cm_list=linear_velocity_cm,
         angular_velocity_deg_list=angular_velocity_deg,
         saveas=saveas,
+        n_jobs=None,
     )
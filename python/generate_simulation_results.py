@@ -13,6 +13,7 @@ import pandas as pd
 import progressbar
 from utils.geometry import get_deltas_from_global
 from utils.inference import get_probability_cost, get_probability_bayes
+from utils.inference import get_interference_distances
 from utils.inference import get_approach_angle_fft, get_approach_angle_cost
 from utils.simulation import get_df_theory_simple
 
@@ -31,7 +32,8 @@ def simulate_frequency_slice(
     distances_cm, frequencies, sigmas_delta_cm, sigmas_f, sigmas_y, n_instances
 ):
 
-    np.random.seed(1)
+    # same stream as np.random.seed(1), so that stored results stay reproducible.
+    random_state = np.random.RandomState(1)
 
     n_methods = len(METHODS)
     distances_grid = np.arange(100)
@@ -46,16 +48,15 @@ def simulate_frequency_slice(
         * n_methods
     )
 
-    results_df = pd.DataFrame(
-        columns=[
-            "sigmadelta",
-            "sigmaf",
-            "sigmay",
-            "method",
-            "error",
-            "counter",
-            "distance",
-        ]
+    records = []
+
+    # the distances of the fft bins only depend on the (noiseless) frequencies
+    # and the geometry, so they are shared by all settings without frequency noise.
+    interference_distances = get_interference_distances(
+        frequencies,
+        mic_idx=MIC_IDX,
+        distance_range=[min(distances_grid), max(distances_grid)],
+        azimuth_deg=AZIMUTH_DEG,
     )
 
     i = 0
@@ -64,24 +65,49 @@ def simulate_frequency_slice(
             for (sigma_delta_cm, sigma_f, sigma_y) in itertools.product(
                 sigmas_delta_cm, sigmas_f, sigmas_y
             ):
-                for counter in range(n_instances):
-                    delta_m_noisy = (
-                        delta_m + np.random.normal(scale=sigma_delta_cm) * 1e-2
-                    )
-                    frequencies_noisy = frequencies + np.random.normal(
-                        scale=sigma_f, size=len(frequencies)
+                # draw the noise of all instances at once. Each row holds the
+                # delta, frequency and slice noise of one instance, in the order
+                # in which they used to be drawn per instance.
+                n_freqs = len(frequencies)
+                noise = random_state.standard_normal((n_instances, 1 + 2 * n_freqs))
+                deltas_m_noisy = delta_m + sigma_delta_cm * noise[:, :1] * 1e-2
+                frequencies_noisy = frequencies + sigma_f * noise[:, 1 : 1 + n_freqs]
+                slices_f = get_df_theory_simple(
+                    deltas_m_noisy, frequencies_noisy, flat=True, d0=d0,
+                )
+                slices_f += sigma_y * noise[:, 1 + n_freqs :]
+
+                # without any noise, all instances give the same result, so only
+                # the first one is evaluated.
+                noiseless = sigma_delta_cm == 0 and sigma_f == 0 and sigma_y == 0
+                n_evaluated = 1 if noiseless else n_instances
+
+                # without frequency noise, all instances share the same frequencies,
+                # so their posteriors can be evaluated at once.
+                if sigma_f == 0 and "fft" in METHODS:
+                    distances_fft, probs_fft, _ = get_probability_bayes(
+                        slices_f[:n_evaluated],
+                        frequencies,
+                        mic_idx=MIC_IDX,
+                        distance_range=[min(distances_grid), max(distances_grid)],
+                        azimuth_deg=AZIMUTH_DEG,
+                        interpolate=False,
+                        interference_distances=interference_distances,
                     )
 
-                    slice_f = get_df_theory_simple(
-                        delta_m_noisy, frequencies_noisy, flat=True, d0=d0,
-                    )
-                    slice_f += np.random.normal(scale=sigma_y, size=len(slice_f))
+                errors = []
+                for counter in range(n_evaluated):
+                    slice_f = slices_f[counter]
+                    frequencies_noisy_i = frequencies_noisy[counter]
 
+                    errors.append({})
                     for method in METHODS:
-                        if method == "fft":
+                        if method == "fft" and sigma_f == 0:
+                            dist, probs = distances_fft, probs_fft[counter]
+                        elif method == "fft":
                             dist, probs, _ = get_probability_bayes(
                                 slice_f,
-                                frequencies_noisy,
+                                frequencies_noisy_i,
                                 mic_idx=MIC_IDX,
                                 distance_range=[
                                     min(distances_grid),
@@ -93,28 +119,33 @@ def simulate_frequency_slice(
                         elif method == "cost":
                             probs = get_probability_cost(
                                 slice_f,
-                                frequencies_noisy,
+                                frequencies_noisy_i,
                                 distances_grid,
                                 mic_idx=MIC_IDX,
                             )
                             dist = distances_grid
 
                         d_estimate = dist[np.argmax(probs)]
-                        error = np.abs(d_estimate - distance_cm)
+                        errors[counter][method] = np.abs(d_estimate - distance_cm)
 
-                        results_df.loc[len(results_df), :] = dict(
-                            counter=counter,
-                            distance=distance_cm,
-                            sigmadelta=sigma_delta_cm,
-                            sigmaf=sigma_f,
-                            sigmay=sigma_y,
-                            method=method,
-                            error=error,
+                for counter in range(n_instances):
+                    for method in METHODS:
+                        records.append(
+                            dict(
+                                counter=counter,
+                                distance=distance_cm,
+                                sigmadelta=sigma_delta_cm,
+                                sigmaf=sigma_f,
+                                sigmay=sigma_y,
+                                method=method,
+                                error=errors[min(counter, n_evaluated - 1)][method],
+                            )
                         )
                         p.update(i)
                         i += 1
 
-    results_df = results_df.apply(pd.to_numeric, errors="ignore", axis=1)
+    results_df = pd.DataFrame(records)
+    results_df = results_df.apply(pd.to_numeric, errors="ignore", axis=0)
     return results_df
 
 
@@ -129,7 +160,8 @@ def simulate_distance_slice(
     ax=None,
 ):
 
-    np.random.seed(1)
+    # same stream as np.random.seed(1), so that stored results stay reproducible.
+    random_state = np.random.RandomState(1)
     n_methods = len(METHODS)
 
     start_distances_grid = np.arange(40, 60)
@@ -143,29 +175,29 @@ def simulate_distance_slice(
         * len(frequencies)
         * n_methods
     )
-    results_df = pd.DataFrame(
-        columns=[
-            "gamma",
-            "startdistance",
-            "frequency",
-            "sigmarelative",
-            "sigmay",
-            "method",
-            "error",
-            "counter",
-        ]
-    )
+    records = []
 
     i = 0
     with progressbar.ProgressBar(max_value=n_total) as p:
         for (gamma_deg, sigma_relative_cm, sigma_y, frequency,) in itertools.product(
             gammas_deg, sigmas_relative_cm, sigmas_y, frequencies
         ):
+            # draw the noise of all instances before evaluating them, in the
+            # same order as before (uniform draws interleave with the normal ones).
+            n_relative = len(relative_distances_cm)
+            noise_relative_cm = np.empty((n_instances, n_relative))
+            noise_start_cm = np.empty(n_instances)
+            noise_y = np.empty((n_instances, n_relative))
             for counter in range(n_instances):
-                relative_cm_noisy = relative_distances_cm + np.random.normal(
-                    scale=sigma_relative_cm, size=len(relative_distances_cm)
+                noise_relative_cm[counter] = random_state.normal(
+                    scale=sigma_relative_cm, size=n_relative
                 )
-                start_distance_random = start_distance_cm + np.random.uniform(-10, 10)
+                noise_start_cm[counter] = random_state.uniform(-10, 10)
+                noise_y[counter] = random_state.normal(scale=sigma_y, size=n_relative)
+
+            for counter in range(n_instances):
+                relative_cm_noisy = relative_distances_cm + noise_relative_cm[counter]
+                start_distance_random = start_distance_cm + noise_start_cm[counter]
                 distances_cm = start_distance_random - relative_cm_noisy * np.sin(
                     gamma_deg / 180 * np.pi
                 )
@@ -176,7 +208,7 @@ def simulate_distance_slice(
                 slice_d = get_df_theory_simple(
                     deltas_m_noisy, frequency, flat=True, d0=d0
                 )
-                slice_d += np.random.normal(scale=sigma_y, size=len(slice_d))
+                slice_d += noise_y[counter]
 
                 for method in METHODS:
                     if method == "fft":
@@ -201,20 +233,23 @@ def simulate_distance_slice(
                     gamma_estimate = gammas[np.argmax(probs)]
                     error = np.abs(gamma_estimate - gamma_deg)
 
-                    results_df.loc[len(results_df), :] = dict(
-                        counter=counter,
-                        gamma=gamma_deg,
-                        startdistance=start_distance_random,
-                        frequency=frequency,
-                        sigmarelative=sigma_relative_cm,
-                        sigmay=sigma_y,
-                        method=method,
-                        error=error,
+                    records.append(
+                        dict(
+                            counter=counter,
+                            gamma=gamma_deg,
+                            startdistance=start_distance_random,
+                            frequency=frequency,
+                            sigmarelative=sigma_relative_cm,
+                            sigmay=sigma_y,
+                            method=method,
+                            error=error,
+                        )
                     )
                     p.update(i)
                     i += 1
 
-    results_df = results_df.apply(pd.to_numeric, errors="ignore", axis=1)
+    results_df = pd.DataFrame(records)
+    results_df = results_df.apply(pd.to_numeric, errors="ignore", axis=0)
     return results_df
 
 
@@ -5,15 +5,17 @@
 helpers.py: Functions common to particle and moving estimator tests.
 """
 
+import math
+
 import numpy as np
-from scipy.stats import norm
 
+from audio_stack.numba_helpers import njit
 from utils.geometry import get_deltas_from_global
 
 DISTANCE_GLOB = 30
 ANGLE_GLOB = 90
 
-DELTA_GRID = np.arange(100)
+DELTA_GRID = np.arange(100, dtype=float)
 
 
 def measure_wall(pose):
@@ -27,6 +29,34 @@ def measure_wall(pose):
     return distance, angle
 
 
+@njit(fastmath=True, cache=True)
+def _norm_pdf_grid(grid, locs, scale):
+    """ Same as scipy.stats.norm.pdf(grid, loc=loc, scale=scale) for each loc in locs.
+
+    :return: array of shape (len(locs) x len(grid))
+    """
+    inv_scale = 1.0 / scale
+    norm_const = inv_scale / math.sqrt(2 * math.pi)
+    out = np.empty((locs.shape[0], grid.shape[0]))
+    for i in range(locs.shape[0]):
+        for j in range(grid.shape[0]):
+            z = (grid[j] - locs[i]) * inv_scale
+            out[i, j] = math.exp(-0.5 * z * z) * norm_const
+    return out
+
+
+def get_delta_probs(delta, prob_method="delta", scale=10):
+    if prob_method == "delta":
+        # DELTA_GRID has unit steps starting at 0, so the closest bin is found
+        # by rounding (ties go to the lower bin, like argmin).
+        idx = min(max(int(np.ceil(delta - 0.5)), 0), len(DELTA_GRID) - 1)
+        probs = np.zeros(len(DELTA_GRID))
+        probs[idx] = 1.0
+    elif prob_method == "normal":
+        probs = _norm_pdf_grid(DELTA_GRID, np.array([delta], dtype=float), scale)[0]
+    return probs
+
+
 def get_delta_distribution(distance, angle, mic_idx, prob_method="delta", scale=10):
     delta = (
         get_deltas_from_global(
@@ -34,9 +64,37 @@ def get_delta_distribution(distance, angle, mic_idx, prob_method="delta", scale=
         )[0]
         * 1e2
     )
+    return DELTA_GRID, get_delta_probs(delta, prob_method, scale)
+
+
+def get_delta_distributions(poses, mic_indices, prob_method="delta", scale=10):
+    """ 
+    Same as get_delta_distribution, for all given poses and mics at once.
+
+    :return: list of diff_dicts of the form {mic_idx: (delta_grid, probs)}, one per pose.
+    """
+    distances, angles = measure_wall(np.array(poses, dtype=float).T)
+    deltas = np.array(
+        [
+            get_deltas_from_global(
+                azimuth_deg=angles, distances_cm=distances, mic_idx=mic_idx
+            )[0]
+            for mic_idx in mic_indices
+        ]
+    ) * 1e2  # n_mics x n_poses
+
+    # probs of all mics and poses, n_mics x n_poses x n_grid
     if prob_method == "delta":
-        probs = np.zeros(len(DELTA_GRID))
-        probs[np.argmin(np.abs(DELTA_GRID - delta))] = 1.0
+        idx = np.clip(np.ceil(deltas - 0.5), 0, len(DELTA_GRID) - 1).astype(int)
+        probs_all = np.zeros(deltas.shape + (len(DELTA_GRID),))
+        np.put_along_axis(probs_all, idx[..., None], 1.0, axis=-1)
     elif prob_method == "normal":
-        probs = norm.pdf(DELTA_GRID, loc=delta, scale=scale)
-    return DELTA_GRID, probs
+        probs_all = _norm_pdf_grid(DELTA_GRID, deltas.ravel(), scale).reshape(
+            deltas.shape + (len(DELTA_GRID),)
+        )
+
+    diff_dicts = [{} for __ in poses]
+    for mic_idx, probs_mic in zip(mic_indices, probs_all):
+        for diff_dict, probs in zip(diff_dicts, probs_mic):
+            diff_dict[mic_idx] = (DELTA_GRID, probs)
+    return diff_dicts
@@ -0,0 +1,46 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_beam_former.py: Test the spatial spectra of the beamformer.
+"""
+import numpy as np
+
+from audio_stack.beam_former import BeamFormer
+
+MIC_POSITIONS = np.array([[0.0, 0.0], [0.1, 0.0], [0.1, 0.1], [0.0, 0.1]])
+FREQUENCIES_HZ = np.linspace(1000, 4000, 10)
+
+
+def test_mvdr_precision():
+    """ the MVDR spectrum of a single precision, rank-1 R matches the double precision one. """
+    beam_former = BeamFormer(MIC_POSITIONS)
+
+    theta = 60 * np.pi / 180
+    delays = (
+        np.array([np.cos(theta), np.sin(theta)])
+        @ (MIC_POSITIONS[0] - MIC_POSITIONS).T
+        / 343
+    )
+    signals_f = np.exp(-2j * np.pi * FREQUENCIES_HZ[:, None] * delays[None, :])
+    R = beam_former.get_correlation(signals_f)
+
+    spectrum_double = beam_former.get_mvdr_spectrum(R, FREQUENCIES_HZ)
+    spectrum_single = beam_former.get_mvdr_spectrum(
+        R.astype(np.complex64), FREQUENCIES_HZ
+    )
+    assert spectrum_single.dtype == np.float32
+    assert np.all(np.isfinite(spectrum_single))
+    # away from the source the spectrum is close to zero, so the error is
+    # measured relative to the peak of each frequency.
+    peaks = np.max(spectrum_double, axis=1, keepdims=True)
+    np.testing.assert_allclose(
+        spectrum_single / peaks, spectrum_double / peaks, rtol=0, atol=1e-3
+    )
+    np.testing.assert_array_equal(
+        np.argmax(spectrum_single, axis=1), np.argmax(spectrum_double, axis=1)
+    )
+
+
+if __name__ == "__main__":
+    test_mvdr_precision()
+    print("done")
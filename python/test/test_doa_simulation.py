@@ -0,0 +1,33 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_doa_simulation.py: Test helper functions of the DOA simulation.
+"""
+import sys, os
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.getcwd(), "../")))
+from generate_doa_simulation_results import from_0_to_2pi, from_0_to_360
+
+
+def test_from_0_to_2pi():
+    angles = np.linspace(-4 * np.pi, 4 * np.pi, 101)
+    wrapped = from_0_to_2pi(angles)
+    assert np.all(wrapped > 0)
+    assert np.all(wrapped <= 2 * np.pi)
+    np.testing.assert_allclose(np.cos(wrapped), np.cos(angles), atol=1e-10)
+    np.testing.assert_allclose(np.sin(wrapped), np.sin(angles), atol=1e-10)
+
+    # scalars and lists give the same result as arrays.
+    for angle, expected in zip(angles, wrapped):
+        assert np.ndim(from_0_to_2pi(float(angle))) == 0
+        np.testing.assert_allclose(from_0_to_2pi(float(angle)), expected)
+    np.testing.assert_allclose(from_0_to_2pi(list(angles)), wrapped)
+
+    np.testing.assert_allclose(from_0_to_2pi(0.0), 2 * np.pi)
+    np.testing.assert_allclose(from_0_to_360(-90.0), 270.0)
+
+
+if __name__ == "__main__":
+    test_from_0_to_2pi()
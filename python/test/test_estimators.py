@@ -11,7 +11,7 @@ import numpy as np
 sys.path.append(os.path.abspath(os.path.join(os.getcwd(), "../")))
 from utils.moving_estimators import MovingEstimator, get_estimate
 
-from helpers import measure_wall, get_delta_distribution
+from helpers import measure_wall, get_delta_distributions
 
 MIC_IDX = [0, 1]
 
@@ -105,15 +105,9 @@ def do_test_linear(
         ]
         for step in np.linspace(0, 19, 3)
     ]
-    for i, pose in enumerate(poses):
+    diff_dicts = get_delta_distributions(poses, MIC_IDX, prob_method)
+    for i, (pose, diff_dict) in enumerate(zip(poses, diff_dicts)):
         distance, angle = measure_wall(pose)
-
-        diff_dict = {}
-        for mic_idx in MIC_IDX:
-            delta_grid, probs = get_delta_distribution(
-                distance, angle, mic_idx, prob_method
-            )
-            diff_dict[mic_idx] = (delta_grid, probs)
         moving_estimator.add_distributions(diff_dict, pose[:2], pose[2])
         # print(f"added {distance:.2f}, {angle:.0f} at pose {i}")
 
@@ -191,14 +185,9 @@ def do_test_rotation(prob_method, n_window):
     # the wall is located at 30cm north from the origin, horizontal.
 
     poses = [[0, 10, -90], [10, 20, -180], [20, 10, 90], [10, 0, 0]]
-    for i, pose in enumerate(poses):
+    diff_dicts = get_delta_distributions(poses, MIC_IDX, prob_method)
+    for i, (pose, diff_dict) in enumerate(zip(poses, diff_dicts)):
         distance, angle = measure_wall(pose)
-        diff_dict = {}
-        for mic_idx in MIC_IDX:
-            delta_grid, probs = get_delta_distribution(
-                distance, angle, mic_idx, prob_method
-            )
-            diff_dict[mic_idx] = (delta_grid, probs)
         moving_estimator.add_distributions(diff_dict, pose[:2], pose[2])
         print(f"added {distance, angle} at pose {i}")
 
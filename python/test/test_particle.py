@@ -11,7 +11,7 @@ import matplotlib.pylab as plt
 sys.path.append(os.path.abspath(os.path.join(os.getcwd(), "../")))
 from utils.particle_estimators import ParticleEstimator
 
-from helpers import get_delta_distribution, measure_wall, DISTANCE_GLOB, ANGLE_GLOB
+from helpers import get_delta_distributions, measure_wall, DISTANCE_GLOB, ANGLE_GLOB
 
 MIC_IDX = [0, 1]
 SCALE = 500
@@ -106,18 +106,12 @@ def do_test(particle_filter, title="", global_=True):
 
     # fig_pos, axs_pos = plt.subplots(len(poses), 2)
     # fig_pos.suptitle(f"{title} over time")
-    for i, pose in enumerate(poses):
+    diff_dicts = get_delta_distributions(poses, MIC_IDX, prob_method="normal")
+    for i, (pose, diff_dict) in enumerate(zip(poses, diff_dicts)):
         distance, angle = measure_wall(pose)
         print("local distance and angle", distance, angle)
         print("pose:", pose)
 
-        diff_dict = {}
-        for mic_idx in MIC_IDX:
-            delta_grid, probs = get_delta_distribution(
-                distance, angle, mic_idx, prob_method="normal"
-            )
-            diff_dict[mic_idx] = (delta_grid, probs)
-
         particle_filter.add_distributions(diff_dict, pose[:2], pose[2])
 
         particle_filter.predict()
@@ -0,0 +1,49 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+test_processor.py: Test the bandpass filter of the audio processor.
+"""
+import numpy as np
+import pytest
+from scipy import signal
+
+# the processor needs the crazyflie-audio submodule and rclpy.
+processor = pytest.importorskip("audio_stack.processor")
+
+FS = 32000
+N_BUFFER = 2048
+
+
+def get_signals():
+    return np.random.RandomState(1).standard_normal((4, N_BUFFER))
+
+
+def test_sosfilt_rows():
+    sos = processor.get_bandpass_sos(FS, **processor.METHOD_NOISE_DICT["bandpass"])
+    signals = get_signals()
+    np.testing.assert_allclose(
+        processor.sosfilt_rows(sos, signals),
+        signal.sosfilt(sos, signals, axis=1),
+        rtol=0,
+        atol=1e-10,
+    )
+
+
+def test_bandpass():
+    """ the bandpass of get_stft gives the same signals as filter_iir_bandpass. """
+    params = processor.METHOD_NOISE_DICT["bandpass"]
+    signals = get_signals()
+    signals_old = processor.filter_iir_bandpass(
+        signals, Fs=FS, method="cheby2", plot=False, **params
+    )
+    sos = processor.get_bandpass_sos(FS, **params)
+    signals_new = processor.sosfilt_rows(sos, signals)
+    np.testing.assert_allclose(
+        signals_new, signals_old, rtol=0, atol=1e-6 * np.max(np.abs(signals_old))
+    )
+
+
+if __name__ == "__main__":
+    test_sosfilt_rows()
+    test_bandpass()
+    print("done")
@@ -90,8 +90,10 @@ def read_df(
             row[int_name] = int(row[int_name])
 
         if "signals_real_vect" in row.index:
-            signals_f = row.signals_real_vect + 1j * row.signals_imag_vect
-            signals_f = signals_f.reshape((row.n_mics, row.n_frequencies))
+            # fill real and imaginary parts in place, without the 1j * temporary.
+            signals_f = np.empty((row.n_mics, row.n_frequencies), dtype=np.complex64)
+            signals_f.real.flat = row.signals_real_vect
+            signals_f.imag.flat = row.signals_imag_vect
             row["signals_f"] = signals_f
 
         if "mic_positions" in row.index:
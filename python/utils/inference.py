@@ -6,6 +6,7 @@ inference.py: Get probability distributions and estimates of angle or distance f
 """
 
 import numpy as np
+from scipy.fft import rfft, rfftfreq
 
 from .constants import PLATFORM, SPEED_OF_SOUND
 from .geometry import get_orthogonal_distance_from_global
@@ -251,16 +252,20 @@ class Inference(object):
 
 
 def get_abs_fft(f_slice, n_max=N_MAX):
-    f_slice_norm = f_slice - np.nanmean(f_slice)
-    n = max(len(f_slice), n_max)
-    return np.abs(np.fft.rfft(f_slice_norm, n=n))
+    """ 
+    :param f_slice: slice of shape (n_values,), or (n_slices, n_values) to
+    transform multiple slices at once.
+    """
+    f_slice_norm = f_slice - np.nanmean(f_slice, axis=-1, keepdims=True)
+    n = max(f_slice.shape[-1], n_max)
+    return np.abs(rfft(f_slice_norm, n=n, axis=-1, workers=-1))
 
 
 def get_differences(frequencies, n_max=N_MAX):
 
     n = max(len(frequencies), n_max)
     df = np.median(np.diff(frequencies))
-    deltas_cm = np.fft.rfftfreq(n, df) * SPEED_OF_SOUND * 100
+    deltas_cm = rfftfreq(n, df) * SPEED_OF_SOUND * 100
     return deltas_cm
 
 
@@ -272,8 +277,33 @@ def convert_differences_to_distances(differences_cm, mic_idx, azimuth_deg):
     return distances
 
 
+def get_interference_distances(
+    frequencies, mic_idx=1, distance_range=None, n_max=N_MAX, azimuth_deg=None
+):
+    """ Get the distances corresponding to the bins of get_abs_fft.
+
+    The result only depends on the frequencies and the geometry, so it can be computed
+    once and passed to get_probability_bayes as long as these do not change.
+
+    :return: distances, path differences, and mask of bins within distance_range.
+    """
+    differences = get_differences(frequencies, n_max=n_max)
+    distances = convert_differences_to_distances(
+        differences, mic_idx, azimuth_deg=azimuth_deg
+    )
+    if distance_range is not None:
+        mask = (distances >= distance_range[0]) & (distances <= distance_range[1])
+    else:
+        mask = np.ones(len(distances), dtype=bool)
+    return distances[mask], differences[mask], mask
+
+
 def get_posterior(abs_fft, sigma=None, data=None):
-    N = len(abs_fft)
+    """ 
+    :param abs_fft: absolute fft of shape (n_values,), or (n_slices, n_values)
+    for multiple slices, in which case data is of shape (n_slices, n_data).
+    """
+    N = abs_fft.shape[-1]
     periodogram = 1 / N * abs_fft ** 2
     # print('periodogram:', np.min(periodogram), np.max(periodogram))
 
@@ -283,25 +313,35 @@ def get_posterior(abs_fft, sigma=None, data=None):
             # TODO(FD) we do below for numerical reasons. its effect
             # is undone by later exponentiation anyways. Make sure
             # this really as no effect on the result.
-            periodogram -= np.max(periodogram)
+            periodogram -= np.max(periodogram, axis=-1, keepdims=True)
             posterior = np.exp(periodogram)
         else:  # this is the limit of exp for sigma to 0
-            posterior = np.zeros(len(periodogram))
-            posterior[np.argmax(periodogram)] = 1.0
+            posterior = np.zeros(periodogram.shape)
+            np.put_along_axis(
+                posterior,
+                np.argmax(periodogram, axis=-1)[..., None],
+                1.0,
+                axis=-1,
+            )
     else:
-        d_bar = 1 / len(data) * np.sum((data - np.mean(data)) ** 2)
-        if d_bar == 0:
+        d_bar = np.var(data, axis=-1, keepdims=True)
+        if np.all(d_bar == 0):
             return np.ones_like(periodogram)
 
-        arg = 1 - 2 * periodogram / (N * d_bar)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            arg = 1 - 2 * periodogram / (N * d_bar)
+        # slices without variance have a flat posterior, like in the
+        # single-slice case, so they are masked instead of reported below.
+        arg = np.where(d_bar == 0, 1.0, arg)
 
         # arg may not be negative.
-        if np.any(arg <= 0):
-            valid = np.where(arg > 0)[0]
+        invalid = arg <= 0
+        if np.any(invalid):
             print(
-                "Warning, arg is non-positive at", arg[arg <= 0], np.where(arg <= 0)[0]
+                "Warning, arg is non-positive at", arg[invalid], np.where(invalid)[-1]
             )
-            arg[arg <= 0] = np.min(arg[arg > 0])
+            arg_min = np.min(np.where(invalid, np.inf, arg), axis=-1, keepdims=True)
+            arg = np.where(invalid, arg_min, arg)
 
         posterior = (arg) ** ((2 - N) / 2)
         # posterior = np.exp(periodogram)
@@ -317,37 +357,35 @@ def get_probability_bayes(
     sigma=None,
     azimuth_deg=None,
     interpolate=INTERPOLATE,
+    interference_distances=None,
 ):
-    assert f_slice.ndim == 1
+    """
+    :param f_slice: slice of shape (n_frequencies,), or (n_slices, n_frequencies)
+    to evaluate multiple slices at the same frequencies at once.
+    :param interference_distances: output of get_interference_distances for the
+    used frequencies, computed here if not given.
+    """
+    assert f_slice.ndim in (1, 2)
 
     if interpolate:
-        frequencies_grid, f_slice_grid = interpolate_parts(
-            frequencies, f_slice,  # step=20
-        )
-        abs_fft = get_abs_fft(f_slice_grid, n_max=n_max)
-        differences = get_differences(frequencies_grid, n_max=n_max)
-        posterior = get_posterior(abs_fft, sigma, data=f_slice_grid)
-    else:
-        abs_fft = get_abs_fft(f_slice, n_max=n_max)
+        if f_slice.ndim > 1:
+            raise ValueError("Interpolation is only supported for a single slice.")
+        frequencies, f_slice = interpolate_parts(frequencies, f_slice)
 
-        # get path interference differences corresponding to used frequencies
-        differences = get_differences(frequencies, n_max=n_max)
+    abs_fft = get_abs_fft(f_slice, n_max=n_max)
 
-        # convert absolute fft to posterior (no correction yet!)
-        posterior = get_posterior(abs_fft, sigma, data=f_slice)
+    # convert absolute fft to posterior (no correction yet!)
+    posterior = get_posterior(abs_fft, sigma, data=f_slice)
 
-    # convert differences to distances, for immediate evaluations.
-    distances = convert_differences_to_distances(
-        differences, mic_idx, azimuth_deg=azimuth_deg
-    )
-
-    if distance_range is not None:
-        mask = (distances >= distance_range[0]) & (distances <= distance_range[1])
-        distances = distances[mask]
-        posterior = posterior[mask]
-        differences = differences[mask]
+    # get path interference differences and distances corresponding to used frequencies
+    if interference_distances is None:
+        interference_distances = get_interference_distances(
+            frequencies, mic_idx, distance_range, n_max, azimuth_deg
+        )
+    distances, differences, mask = interference_distances
+    posterior = posterior[..., mask]
 
-    posterior /= np.sum(posterior)
+    posterior /= np.sum(posterior, axis=-1, keepdims=True)
     return distances, posterior, differences
 
 
@@ -395,18 +433,21 @@ def get_probability_cost(
     f_slice_norm = f_slice - np.mean(f_slice)
     f_slice_norm /= np.std(f_slice_norm)
 
-    probs = np.empty(len(distances))
-    theory = np.empty((len(distances), len(frequencies)))
-    for i, d in enumerate(distances):
-        if relative_ds is not None:
-            d += relative_ds
-        f_slice_theory = get_freq_slice_theory(
-            frequencies, d, azimuth_deg=azimuth_deg, chosen_mics=[mic_idx]
-        ).flatten()
-        f_slice_theory -= np.mean(f_slice_theory)
-        f_slice_theory /= np.std(f_slice_theory)
-        probs[i] = np.exp(-np.linalg.norm(f_slice_theory - f_slice_norm))
-        theory[i, :] = f_slice_theory
+    # evaluate the theoretical slices of all distances at once.
+    distances_grid = np.array(distances, dtype=float)[:, None]
+    if relative_ds is not None:
+        distances_grid = distances_grid + relative_ds[None, :]
+    # theory is of shape n_distances x n_frequencies
+    theory = get_freq_slice_theory(
+        frequencies, distances_grid, azimuth_deg=azimuth_deg, chosen_mics=[mic_idx]
+    )[:, :, 0]
+
+    # standardize and exponentiate in-place to avoid temporary arrays.
+    theory -= np.mean(theory, axis=1, keepdims=True)
+    theory /= np.std(theory, axis=1, keepdims=True)
+    residual = theory - f_slice_norm[None, :]
+    probs = np.sqrt(np.einsum("ij,ij->i", residual, residual))
+    np.exp(np.negative(probs, out=probs), out=probs)
 
     if ax is not None:
         ax.plot(frequencies, f_slice_norm, color="black", marker="o")
@@ -520,27 +561,34 @@ def get_approach_angle_cost(
 ):
     d_slice_norm = standardize_vec(d_slice)
 
-    probs = np.zeros((len(start_distances_grid_cm), len(gammas_grid_deg)))
-    for i, start_distance_cm in enumerate(start_distances_grid_cm):
-        for j, gamma_deg in enumerate(gammas_grid_deg):
-            distances_cm = start_distance_cm - relative_distances_cm * np.sin(
-                gamma_deg / 180 * np.pi
-            )
-            assert np.all(distances_cm >= 0)
-            d_slice_theory = get_dist_slice_theory(
-                frequency, distances_cm, azimuth_deg
-            )[:, mic_idx]
+    # distances of shape n_start_distances x n_gammas x n_relative_distances
+    start_distances_cm = np.asarray(start_distances_grid_cm, dtype=float)
+    sin_gammas = np.sin(np.asarray(gammas_grid_deg) / 180 * np.pi)
+    distances_cm = (
+        start_distances_cm[:, None, None]
+        - relative_distances_cm[None, None, :] * sin_gammas[None, :, None]
+    )
+    assert np.all(distances_cm >= 0)
+    d_slice_theory = get_dist_slice_theory(
+        frequency, distances_cm, azimuth_deg, chosen_mics=[mic_idx]
+    )[..., 0]
 
-            d_slice_theory = standardize_vec(d_slice_theory)
+    # same as standardize_vec, along the last axis.
+    d_slice_theory -= np.nanmean(d_slice_theory, axis=-1, keepdims=True)
+    std = np.nanstd(d_slice_theory, axis=-1, keepdims=True)
+    np.divide(d_slice_theory, std, out=d_slice_theory, where=std > 0)
 
-            assert d_slice_theory.shape == d_slice_norm.shape
-            loss = np.linalg.norm(d_slice_theory - d_slice_norm)
-            probs[i, j] = np.exp(-loss)
+    assert d_slice_theory.shape[-1:] == d_slice_norm.shape
+    residual = d_slice_theory - d_slice_norm
+    probs = np.sqrt(np.einsum("...k,...k->...", residual, residual))
+    np.exp(np.negative(probs, out=probs), out=probs)
 
-            if ax is not None:
+    if ax is not None:
+        for i, start_distance_cm in enumerate(start_distances_grid_cm):
+            for j, gamma_deg in enumerate(gammas_grid_deg):
                 ax.plot(
-                    distances_cm,
-                    d_slice_theory,
+                    distances_cm[i, j],
+                    d_slice_theory[i, j],
                     label=f"{start_distance_cm}cm, {gamma_deg}deg",
                 )
     probs_angle = np.nanmax(probs, axis=0)  # take maximum across distances
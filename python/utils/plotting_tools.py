@@ -266,7 +266,7 @@ def pcolorfast_custom(
     ax.set_xticklabels(np.round(xs[:: len(xs) // n_xticks]).astype(int))
     if len(yticks) // n_yticks == 0:
         return im
-    if ys.dtype == np.float:
+    if np.issubdtype(ys.dtype, np.floating):
         ax.set_yticks(yticks[:: len(yticks) // n_yticks])
         ax.set_yticklabels(np.round(ys[:: len(ys) // n_yticks], 1))
     else:
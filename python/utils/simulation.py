@@ -258,15 +258,19 @@ def get_freq_slice_theory(
     """ 
     We can incorporate relative movement by providing
     distance_cm and azimuth_deg of same length as frequencies. 
+
+    Multiple distances can be evaluated at once by providing distance_cm of shape
+    (n_distances, 1), or (n_distances, n_frequencies) for relative movement. The output
+    is then of shape (n_distances, n_frequencies, n_mics) instead of (n_frequencies, n_mics).
     """
-    Hs = np.zeros((len(frequencies), len(chosen_mics)))
-    for i, mic in enumerate(chosen_mics):
+    Hs = []
+    for mic in chosen_mics:
         deltas_m, d0 = get_deltas_from_global(
             azimuth_deg=azimuth_deg, distances_cm=distance_cm, mic_idx=mic
         )
         pattern = get_df_theory_simple(deltas_m, frequencies, d0, flat=True)
-        Hs[:, i] = pattern
-    return Hs
+        Hs.append(pattern)
+    return np.stack(Hs, axis=-1)
 
 
 def get_dist_slice_theory(
@@ -280,13 +284,15 @@ def get_dist_slice_theory(
     """ 
     We can incorporate relative movement by providing
     distance_cm and azimuth_deg of same length as frequencies. 
+
+    distances_cm can have any shape, the output is of shape (*distances_cm.shape, n_mics).
     """
     if np.ndim(gains) == 0:
         gains = [gains] * len(chosen_mics)
     elif len(gains) == 1:
         gains = [gains[0]] * len(chosen_mics)
 
-    Hs = np.zeros((len(distances_cm), len(chosen_mics)))
+    Hs = np.zeros(np.shape(distances_cm) + (len(chosen_mics),))
     for i, mic in enumerate(chosen_mics):
         deltas_m, d0 = get_deltas_from_global(azimuth_deg, distances_cm, mic)
         pattern = get_df_theory_simple(
@@ -298,7 +304,7 @@ def get_dist_slice_theory(
             gain=gains[i],
             c=SPEED_OF_SOUND,
         )
-        Hs[:, i] = pattern.flatten()
+        Hs[..., i] = pattern.reshape(np.shape(distances_cm))
     return Hs
 
 
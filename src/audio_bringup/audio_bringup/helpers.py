@@ -6,6 +6,7 @@ helpers.py: general launching functions.
 """
 import os
 import subprocess
+import time
 import yaml
 
 LOG_LEVEL = "info"
@@ -28,7 +29,7 @@ def get_filename(**params):
     props_flag = "" if params.get("props") == 1 else "no"
     snr_flag = params.get("bin_selection", 0)
     motors = params.get("motors")
-    motors_flag = "" if ((type(motors) == str) or (motors > 0)) else "no"
+    motors_flag = "" if (isinstance(motors, str) or (motors > 0)) else "no"
     ending = "" if params.get("degree", 0) == 0 else f"_{params.get('degree')}"
     ending_distance = (
         ""
@@ -41,7 +42,7 @@ def get_filename(**params):
 
 
 def set_param(node_name, param_name, param_value):
-    if type(param_value) != str:
+    if not isinstance(param_value, str):
         param_value = str(param_value)
     param_pid = subprocess.Popen(
         ["ros2", "param", "set", node_name, param_name, param_value],
@@ -57,6 +58,47 @@ def set_param(node_name, param_name, param_value):
         return False
 
 
+# clients of the SetParametersAtomically services, by node name.
+_param_clients = {}
+
+
+def set_params(ros_node, node_name, params_dict):
+    """ 
+    Set all parameters of params_dict on node_name in one atomic service call,
+    instead of one ros2 param set subprocess per parameter.
+
+    :param ros_node: rclpy node used to call the service.
+    """
+    import rclpy
+    from rclpy.parameter import Parameter
+    from rcl_interfaces.srv import SetParametersAtomically
+
+    client = _param_clients.get(node_name)
+    if client is None:
+        client = ros_node.create_client(
+            SetParametersAtomically, f"{node_name}/set_parameters_atomically"
+        )
+        _param_clients[node_name] = client
+    if not client.wait_for_service(timeout_sec=5.0):
+        print("set_params error: service not available for", node_name)
+        return False
+
+    request = SetParametersAtomically.Request()
+    request.parameters = [
+        Parameter(name, value=value).to_parameter_msg()
+        for name, value in params_dict.items()
+    ]
+    print("waiting to set params:", params_dict)
+    future = client.call_async(request)
+    rclpy.spin_until_future_complete(ros_node, future)
+    result = future.result().result
+    if result.successful:
+        return True
+    else:
+        print("set_params error:", result.reason)
+        return False
+
+
 def get_launch_description(
     node_config,
     log_level=LOG_LEVEL,
@@ -154,8 +196,22 @@ def parse_params_file(params_file):
     return launch_options_dict
 
 
-def get_active_nodes():
-    param_pid = subprocess.Popen(["ros2", "node", "list"], stdout=subprocess.PIPE)
-    out_bytes, err = param_pid.communicate()
-    out_string = out_bytes.decode("utf-8").strip()
-    return out_string
+def get_active_nodes(ros_node, required_nodes=(), timeout_sec=3.0):
+    """ 
+    Return the set of full names (e.g. /gateway) of the nodes in the ROS graph.
+
+    :param ros_node: rclpy node whose graph is queried.
+    :param required_nodes: wait up to timeout_sec for these nodes to be discovered.
+    """
+    start_time = time.monotonic()
+    while True:
+        active_nodes = {
+            "/".join([namespace.rstrip("/"), name])
+            for name, namespace in ros_node.get_node_names_and_namespaces()
+        }
+        if set(required_nodes) <= active_nodes:
+            break
+        if time.monotonic() - start_time > timeout_sec:
+            break
+        time.sleep(0.1)
+    return active_nodes
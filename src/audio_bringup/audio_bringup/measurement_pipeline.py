@@ -4,16 +4,26 @@
 measurement_pipeline.py
 """
 
+import asyncio
+import functools
 import os
-import signal
-import subprocess
 import sys
+import threading
 import time
 import warnings
 
 import numpy as np
 import rclpy
-from scipy.io import wavfile
+
+import rosbag2_py
+from rosidl_runtime_py.utilities import get_message
+import soundfile as sf
+
+try:
+    # the events executor does not rescan all entities to find ready callbacks.
+    from rclpy.experimental import EventsExecutor as BagExecutor
+except ImportError:  # only available in recent ROS 2 distributions.
+    from rclpy.executors import SingleThreadedExecutor as BagExecutor
 
 sys.path.append(os.getcwd() + "/crazyflie-audio/python/")
 from play_and_record import get_usb_soundcard_ubuntu
@@ -27,6 +37,7 @@ from audio_bringup.helpers import (
     get_active_nodes,
     get_filename,
     set_param,
+    set_params,
     EXP_DIRNAME,
     CSV_DIRNAME,
     WAV_DIRNAME,
@@ -87,11 +98,18 @@ EXTRA_DIRNAME = "2021_10_12_doa_stepper"
 EXTRA_REC_TIME = 2  # extra duration for recording time.
 USER_INPUT = True
 
-bag_pid = None
+BAG_DISCOVERY_PERIOD = 0.5  # period of the retries to subscribe to new topics, in seconds.
+
+bag_writer = None
+bag_subscriptions = {}
+bag_timer = None
+bag_lock = threading.Lock()
+bag_node = None
 SerialIn = None
+ros_node = None
 
 
-def execute_commands(command_name, source_type=None):
+def get_command_list(command_name, source_type=None):
     if "mono" in command_name:
         freq = int(command_name.replace("mono", ""))
         if source_type == "buzzer-onboard":
@@ -109,31 +127,90 @@ def execute_commands(command_name, source_type=None):
         command_list = [("/gateway", "all", thrust, 0)]
     else:
         command_list = all_commands_lists[command_name]
+    return command_list
 
+
+async def execute_commands_async(command_name, source_type=None):
+    command_list = get_command_list(command_name, source_type)
+
+    # sleep until absolute deadlines, so that the time spent in set_param
+    # does not delay the following commands. set_param runs in a worker thread
+    # so that other command lists can progress in the meantime.
+    loop = asyncio.get_running_loop()
+    deadline = loop.time()
     for command in command_list:
         node, parameter, value, sleep = command
         if node != "":
             print(f"execute {parameter}: {value} and sleep for {sleep:.2f}s...")
-            set_param(node, parameter, str(value))
+            await loop.run_in_executor(None, set_param, node, parameter, str(value))
         else:
             print(f"sleep for {sleep}s...")
-        time.sleep(sleep)
+        deadline += sleep
+        await asyncio.sleep(max(deadline - loop.time(), 0))
+
+
+def execute_commands(command_name, source_type=None):
+    asyncio.run(execute_commands_async(command_name, source_type))
+
+
+async def execute_commands_in_order_async(commands):
+    """ 
+    Execute the command lists in the given order. Consecutive command lists
+    that set disjoint parameters run concurrently, the others one after the
+    other, so that a parameter always ends up with the value of the last list.
+
+    :param commands: list of (command_name, source_type) tuples.
+    """
+    batch = []
+    batch_parameters = set()
+    for command_name, source_type in commands:
+        parameters = {
+            (node, parameter)
+            for node, parameter, *_ in get_command_list(command_name, source_type)
+            if node != ""
+        }
+        if batch_parameters & parameters:
+            await asyncio.gather(*batch)
+            batch = []
+            batch_parameters = set()
+        batch.append(execute_commands_async(command_name, source_type))
+        batch_parameters |= parameters
+    await asyncio.gather(*batch)
+
+
+# all_commands_lists is static, so the total duration of each command list is computed once.
+COMMAND_TOTAL_TIMES = {
+    name: sum(command[3] for command in command_list)
+    for name, command_list in all_commands_lists.items()
+}
+
+
+@functools.lru_cache(maxsize=None)
+def get_filename_cached(params_items):
+    """ get_filename with memoization, for params given as a sorted tuple of items. """
+    return get_filename(**dict(params_items))
+
+
+@functools.lru_cache(maxsize=8)
+def generate_signal_cached(fs, duration, **kwargs):
+    """ generate_signal with memoization, for repeated experiments with the same source.
+
+    :return: read-only signal, as it is shared between experiments.
+    """
+    signal = generate_signal(fs, duration, **kwargs)
+    signal.flags.writeable = False
+    return signal
 
 
 def get_total_time(command_name):
-    if command_name in all_commands_lists.keys():
-        command_list = all_commands_lists[command_name]
-    else:
+    if command_name not in COMMAND_TOTAL_TIMES:
         warnings.warn(f"Did not find {command_name} in {all_commands_lists.keys()}")
         return 0
-    time = 0
-    for command in command_list:
-        time += command[3]
     # time += 25 # extra 10 seconds for unexpected waiting times
-    return time
+    return COMMAND_TOTAL_TIMES[command_name]
 
 
-def adjust_freq_lims(params):
+def adjust_freq_lims(params, sfx=None):
     min_freq = params.get("min_freq", None)
     max_freq = params.get("max_freq", None)
 
@@ -145,7 +222,9 @@ def adjust_freq_lims(params):
             assert (max_freq is None) or (freq < max_freq)
             return
 
-        __, (min_freq_buzz, max_freq_buzz), __ = SOUND_EFFECTS[params["source"]]
+        if sfx is None:
+            sfx = SOUND_EFFECTS[params["source"]]
+        __, (min_freq_buzz, max_freq_buzz), __ = sfx
         if min_freq is not None:
             print(f"Overwriting min_freq {min_freq} with buzzer {min_freq_buzz}.")
         params["min_freq"] = min_freq_buzz
@@ -155,7 +234,7 @@ def adjust_freq_lims(params):
         params["max_freq"] = max_freq_buzz
 
 
-def adjust_duration(duration, params):
+def adjust_duration(duration, params, sfx=None):
     distance = params.get("distance", None)
     print(params)
     angle = params.get("degree", None)
@@ -186,7 +265,9 @@ def adjust_duration(duration, params):
         if "mono" in params["source"]:
             duration_buzzer = 0
         else:
-            *_, duration_buzzer = SOUND_EFFECTS[params["source"]]
+            if sfx is None:
+                sfx = SOUND_EFFECTS[params["source"]]
+            *_, duration_buzzer = sfx
         if duration_buzzer > duration:
             print(
                 f"ignoring global duration {duration} and using buzzer command duration {duration_buzzer}"
@@ -195,23 +276,91 @@ def adjust_duration(duration, params):
     return duration
 
 
+def resolve_params(params, duration):
+    """ 
+    Resolve everything that depends on the sound source and the motor commands
+    in one place: look up the sound effect once, adjust the frequency limits
+    in params and return the duration of the experiment.
+    """
+    source = params["source"]
+    if (source is not None) and ("mono" not in source):
+        sfx = SOUND_EFFECTS[source]
+    else:
+        sfx = None
+    duration = adjust_duration(duration, params, sfx)
+    adjust_freq_lims(params, sfx)
+    return duration
+
+
 def set_audio_parameters(params, params_old):
     audio_parameters = ["min_freq", "max_freq", "window_type", "bin_selection", "props"]
+    changed_params = {}
     for key, value in params.items():
         if not key in audio_parameters:
             continue
 
         value_old = params_old.get(key, DEFAULT_PARAMS[key])
         if value_old != value:
-            set_param("/gateway", PARAM_NAMES.get(key, key), str(value))
+            changed_params[PARAM_NAMES.get(key, key)] = value
+    if len(changed_params):
+        set_params(ros_node, "/gateway", changed_params)
+
+
+def write_bag_message(topic, data):
+    with bag_lock:
+        # messages arriving after the recording was stopped are dropped.
+        if bag_writer is not None:
+            bag_writer.write(topic, data, bag_node.get_clock().now().nanoseconds)
+
+
+def subscribe_bag_topics():
+    """ 
+    Subscribe to the topics to record that are advertised by now. Called
+    from bag_timer until all topics are recorded.
+    """
+    global bag_timer
+    with bag_lock:
+        if bag_writer is None:
+            return
+        topic_types = dict(bag_node.get_topic_names_and_types())
+        for topic in TOPICS_TO_RECORD:
+            if (topic in bag_subscriptions) or (topic not in topic_types):
+                continue
+            type_name = topic_types[topic][0]
+            bag_writer.create_topic(
+                rosbag2_py.TopicMetadata(
+                    name=topic, type=type_name, serialization_format="cdr"
+                )
+            )
+            # raw subscriptions hand over the serialized message, which is
+            # written as is.
+            bag_subscriptions[topic] = bag_node.create_subscription(
+                get_message(type_name),
+                topic,
+                lambda data, topic=topic: write_bag_message(topic, data),
+                10,
+                raw=True,
+            )
+            print("started recording", topic)
+        if (len(bag_subscriptions) == len(TOPICS_TO_RECORD)) and (
+            bag_timer is not None
+        ):
+            bag_timer.cancel()
 
 
 def start_bag_recording(bag_filename):
-    global bag_pid
-    set_param("/csv_writer", "filename", "")
-    bag_pid = subprocess.Popen(
-        ["ros2", "bag", "record", "-o", bag_filename] + TOPICS_TO_RECORD
-    )
+    global bag_writer, bag_timer
+    set_params(ros_node, "/csv_writer", {"filename": ""})
+
+    with bag_lock:
+        bag_writer = rosbag2_py.SequentialWriter()
+        bag_writer.open(
+            rosbag2_py.StorageOptions(uri=bag_filename, storage_id="sqlite3"),
+            rosbag2_py.ConverterOptions("cdr", "cdr"),
+        )
+        # topics that are not advertised yet are subscribed to once they appear.
+        bag_timer = bag_node.create_timer(BAG_DISCOVERY_PERIOD, subscribe_bag_topics)
+    subscribe_bag_topics()
     print("started bag record")
 
 
@@ -229,14 +378,80 @@ def start_moving(distance, angle):
 
 
 def save_bag_recording(csv_filename):
-    bag_pid.send_signal(signal.SIGINT)
-    set_param("/csv_writer", "filename", csv_filename)
+    global bag_writer, bag_timer
+    with bag_lock:
+        bag_node.destroy_timer(bag_timer)
+        bag_timer = None
+        for subscription in bag_subscriptions.values():
+            bag_node.destroy_subscription(subscription)
+        missing_topics = set(TOPICS_TO_RECORD) - set(bag_subscriptions)
+        if len(missing_topics):
+            print("did not record inactive topics", missing_topics)
+        bag_subscriptions.clear()
+        # older writers have no close() and are finalized when destroyed,
+        # which happens here since no callback refers to them.
+        if hasattr(bag_writer, "close"):
+            bag_writer.close()
+        bag_writer = None
+    set_params(ros_node, "/csv_writer", {"filename": csv_filename})
 
 
 def main(args=None):
+    def start_wav_recording(wav_filename, n_frames, out_signal=None):
+        """ 
+        Record n_frames from the sound card straight into wav_filename, while
+        playing out_signal if given. The blocks are written to disk as they
+        arrive, so the recording is never held in memory as a whole.
+
+        :return: (stream, wav_file), to be passed to save_wav_recording.
+        """
+        fs = global_params["fs_soundcard"]
+        n_channels = global_params["n_meas_mics"]
+        wav_file = sf.SoundFile(
+            wav_filename, "w", samplerate=fs, channels=n_channels, subtype="FLOAT"
+        )
+        n_written = 0
+
+        def write_block(indata, frames):
+            nonlocal n_written
+            n_keep = min(frames, n_frames - n_written)
+            wav_file.write(indata[:n_keep])
+            n_written += n_keep
+            if n_written >= n_frames:
+                raise sd.CallbackStop
+
+        if out_signal is None:
+
+            def callback(indata, frames, time, status):
+                write_block(indata, frames)
+
+            stream = sd.InputStream(
+                samplerate=fs, channels=n_channels, dtype="float32", callback=callback
+            )
+        else:
+            out_signal = out_signal.reshape(len(out_signal), -1)
+
+            def callback(indata, outdata, frames, time, status):
+                chunk = out_signal[n_written : n_written + frames]
+                outdata[: len(chunk)] = chunk
+                outdata[len(chunk) :] = 0
+                write_block(indata, frames)
+
+            stream = sd.Stream(
+                samplerate=fs,
+                channels=(n_channels, out_signal.shape[1]),
+                dtype="float32",
+                callback=callback,
+            )
+        stream.start()
+        return stream, wav_file
+
     def save_wav_recording(recording, wav_filename):
-        recording_float32 = recording.astype(np.float32)
-        wavfile.write(wav_filename, global_params["fs_soundcard"], recording_float32)
+        stream, wav_file = recording
+        while stream.active:
+            time.sleep(0.1)
+        stream.close()
+        wav_file.close()
         print("wrote wav file as", wav_filename)
 
     def perform_experiment(source_type, source_params=None):
@@ -247,7 +462,7 @@ def main(args=None):
         if source_type == "soundcard":
             if "mono" in params["source"]:
                 freq = int(params["source"].replace("mono", ""))
-                out_signal = generate_signal(
+                out_signal = generate_signal_cached(
                     global_params["fs_soundcard"],
                     duration,
                     signal_type="mono",
@@ -256,7 +471,7 @@ def main(args=None):
                     max_dB=source_params["max_dB"],
                 )
             else:
-                out_signal = generate_signal(
+                out_signal = generate_signal_cached(
                     global_params["fs_soundcard"],
                     duration,
                     signal_type=params["source"],
@@ -270,40 +485,50 @@ def main(args=None):
             )
 
         if (source_type == "soundcard") and (global_params["n_meas_mics"] > 0):
-            recording = sd.playrec(out_signal, blocking=False)
+            recording = start_wav_recording(
+                wav_filename, len(out_signal), out_signal=out_signal
+            )
         elif source_type == "soundcard":
             sd.play(out_signal, blocking=False)
         elif global_params["n_meas_mics"] > 0:
             print(f"recording measurement mic for {duration + EXTRA_REC_TIME} seconds")
             n_frames = int((duration + EXTRA_REC_TIME) * global_params["fs_soundcard"])
-            recording = sd.rec(n_frames, blocking=False)
+            recording = start_wav_recording(wav_filename, n_frames)
 
+        # command lists that do not set the same parameters run concurrently,
+        # while the recording is running.
+        commands = []
         if source_type == "soundcard":
             # make sure we measure at correct bins
             if params["source"] is not None:
-                execute_commands(params["source"], source_type=source_type)
+                commands.append((params["source"], source_type))
             # execute motor commands
             if params["motors"] != 0:
                 print(f"executing motor commands", params["motors"])
-                execute_commands(params["motors"])
+                commands.append((params["motors"], None))
         else:
             # start motor commands
             if params["motors"] != 0:
                 print(f"executing motor commands", params["motors"])
-                execute_commands(params["motors"])
+                commands.append((params["motors"], None))
             # play onboard sound
             if params["source"] is not None:
-                execute_commands(params["source"], source_type=source_type)
-
-        # wait for extra time
-        extra_idle_time = duration - (time.time() - start_time)
-        if extra_idle_time > 0:
-            print(f"Waiting for {extra_idle_time:.2f} seconds...")
-            time.sleep(extra_idle_time)
-        elif extra_idle_time < 0:
-            print(
-                f"Error: Finished recording before finishing everything else! {extra_idle_time:.2f}"
-            )
+                commands.append((params["source"], source_type))
+
+        async def run_experiment():
+            await execute_commands_in_order_async(commands)
+
+            # wait for extra time
+            extra_idle_time = duration - (time.time() - start_time)
+            if extra_idle_time > 0:
+                print(f"Waiting for {extra_idle_time:.2f} seconds...")
+                await asyncio.sleep(extra_idle_time)
+            elif extra_idle_time < 0:
+                print(
+                    f"Error: Finished recording before finishing everything else! {extra_idle_time:.2f}"
+                )
+
+        asyncio.run(run_experiment())
         return recording
 
     def measure_doa(params, source_params):
@@ -360,8 +585,18 @@ def main(args=None):
         return perform_experiment(source_type)
 
     rclpy.init(args=args)
-
-    active_nodes = get_active_nodes()
+    global ros_node, bag_node
+    ros_node = rclpy.create_node("measurement_pipeline")
+
+    # the bag recorder has its own node, spun in the background, so that
+    # ros_node can still be spun for the parameter service calls.
+    bag_node = rclpy.create_node("measurement_bag_recorder")
+    bag_executor = BagExecutor()
+    bag_executor.add_node(bag_node)
+    bag_thread = threading.Thread(target=bag_executor.spin, daemon=True)
+    bag_thread.start()
+
+    active_nodes = get_active_nodes(ros_node, ["/csv_writer", "/gateway"])
     assert "/csv_writer" in active_nodes
     assert "/gateway" in active_nodes
 
@@ -391,17 +626,17 @@ def main(args=None):
         sd = get_usb_soundcard_ubuntu(
             global_params["fs_soundcard"], global_params["n_meas_mics"]
         )
-        sound = np.zeros(10, dtype=float)
+        # validate the settings without opening a stream.
         if global_params["n_meas_mics"] > 0:
-            if source_type == "soundcard":
-                print("playing and recording zero test sound...")
-                sd.playrec(sound, blocking=True)
-            else:
-                print("recording zero test sound...")
-                sd.rec(10, blocking=True)
-        else:
-            print("playing zero test sound...")
-            sd.play(sound, blocking=True)
+            print("checking recording settings...")
+            sd.check_input_settings(
+                samplerate=global_params["fs_soundcard"],
+                channels=global_params["n_meas_mics"],
+                dtype="float32",
+            )
+        if source_type == "soundcard":
+            print("checking playing settings...")
+            sd.check_output_settings(samplerate=global_params["fs_soundcard"])
 
     # motors check
     if any([p.get("distance", None) is not None for p in params_list]) or any(
@@ -416,10 +651,11 @@ def main(args=None):
         print("not initializing")
 
     for dirname in [exp_dirname, csv_dirname, wav_dirname]:
-        if not os.path.exists(dirname):
-            os.makedirs(dirname)
+        os.makedirs(dirname, exist_ok=True)
 
     timestamp = int(time.time())
+    # list the experiment folder once, instead of checking each new filename on disk.
+    existing_filenames = set(os.listdir(exp_dirname))
 
     param_i = 0
     params_old = {}
@@ -437,11 +673,11 @@ def main(args=None):
         print("experiment:", params)
 
         #### prepare filenames ####
-        filename = get_filename(**params)
+        filename = get_filename_cached(tuple(sorted(params.items())))
         bag_filename = os.path.join(exp_dirname, filename)
 
         answer = ""
-        while os.path.exists(bag_filename):
+        while filename in existing_filenames:
             answer = (
                 input(
                     f"Path {filename} exists, append something? (default:{timestamp}, n to skip)"
@@ -453,6 +689,7 @@ def main(args=None):
             answer = answer[1:] if answer[0] == "_" else answer
             filename = f"{filename}_{answer}"
             bag_filename = os.path.join(exp_dirname, filename)
+        existing_filenames.add(filename)
 
         csv_filename = os.path.join(csv_dirname, filename)
         wav_filename = os.path.join(wav_dirname, filename) + ".wav"
@@ -471,8 +708,7 @@ def main(args=None):
         print("...done")
 
         #### set parameters ###
-        duration = adjust_duration(global_params.get("duration", 30), params)
-        adjust_freq_lims(params)
+        duration = resolve_params(params, global_params.get("duration", 30))
         set_audio_parameters(params, params_old)
 
         #### perform experiment ###
@@ -499,6 +735,12 @@ def main(args=None):
         SerialIn.move_to(0)
         SerialIn.turn_to(0)
 
+    bag_executor.shutdown()
+    bag_thread.join()
+    bag_node.destroy_node()
+    ros_node.destroy_node()
+    rclpy.shutdown()
+
 
 if __name__ == "__main__":
     main()
@@ -4,6 +4,9 @@
 messages.py: ROS-message to and from numpy-array conversions.
 """
 
+import array
+import math
+
 import numpy as np
 
 from geometry_msgs.msg import PoseStamped, Point, Quaternion
@@ -22,6 +25,45 @@ from audio_interfaces.msg import PoseRaw
 from builtin_interfaces.msg import Time
 
 
+# numpy dtypes of the array.array typecodes used for message fields.
+TYPECODE_DTYPES = {"d": np.float64, "f": np.float32, "H": np.uint16}
+
+
+def to_array(values, typecode):
+    """ Convert values to an array.array, which is assigned to numeric sequence
+    fields without converting and checking each element in python.
+
+    :param typecode: "d" for float64[], "f" for float32[] and "H" for uint16[] fields.
+    """
+    out = array.array(typecode)
+    out.frombytes(
+        np.ascontiguousarray(values, dtype=TYPECODE_DTYPES[typecode]).tobytes()
+    )
+    return out
+
+
+def from_array(values, dtype=float):
+    """ Inverse of to_array: read a numeric sequence field as numpy array.
+
+    array.array fields are wrapped without iterating over the elements. Note
+    that the result is then a read-only view of the message field if no
+    conversion to dtype was needed.
+    """
+    if isinstance(values, array.array):
+        values = np.frombuffer(values, dtype=TYPECODE_DTYPES[values.typecode])
+        # the view aliases the message, which must not be changed through it.
+        values.flags.writeable = False
+    return np.asarray(values, dtype=dtype)
+
+
+def from_complex_arrays(real_values, imag_values, dtype=complex):
+    """ Read two sequence fields as the real and imaginary parts of one complex array. """
+    out = np.empty(len(real_values), dtype=dtype)
+    out.real = from_array(real_values, out.real.dtype)
+    out.imag = from_array(imag_values, out.imag.dtype)
+    return out
+
+
 def get_quaternion(yaw_deg, pitch_deg=0, roll_deg=0):
     from scipy.spatial.transform import Rotation
 
@@ -54,8 +96,8 @@ def convert_stamp_to_ms(stamp):
 def create_distribution_message(values, probs, timestamp):
     msg = Distribution()
     msg.timestamp = int(timestamp)
-    msg.values = list(values.flatten().astype(float))
-    msg.probabilities = list(probs.flatten().astype(float))
+    msg.values = to_array(values.ravel(), "f")
+    msg.probabilities = to_array(probs.ravel(), "f")
     msg.n = len(probs)
     return msg
 
@@ -111,9 +153,9 @@ def create_signals_message(signals, mic_positions, timestamp, fs):
     # this is very unlikely to happen and is
     # probably due to signals having the wrong shape.
     assert msg.n_mics < msg.n_buffer, f"invalid signals shape {signals.shape}"
-    msg.signals_vect = list(signals.flatten().astype(float))
+    msg.signals_vect = to_array(signals.ravel(), "d")
     if mic_positions is not None:
-        msg.mic_positions = list(mic_positions.flatten().astype(float))
+        msg.mic_positions = to_array(mic_positions.ravel(), "f")
     else:
         msg.mic_positions = []
     return msg
@@ -127,7 +169,7 @@ def create_signals_freq_message(
 
     if mic_positions is not None:
         assert signals_f.shape[1] == mic_positions.shape[0]
-        msg.mic_positions = list(mic_positions.flatten().astype(float))
+        msg.mic_positions = to_array(mic_positions.ravel(), "f")
     else:
         msg.mic_positions = []
 
@@ -139,13 +181,13 @@ def create_signals_freq_message(
     msg.audio_timestamp = audio_timestamp
     msg.n_mics = signals_f.shape[1]
     msg.n_frequencies = len(freqs)
-    msg.frequencies = [int(f) for f in freqs]
+    msg.frequencies = to_array(freqs, "H")
 
     assert signals_f.shape[0] == msg.n_frequencies
     assert signals_f.shape[1] == msg.n_mics
     # important: signals_f should be of shape n_mics x n_frequencies before flatten() is called.
-    msg.signals_real_vect = list(np.real(signals_f.T).astype(float).flatten())
-    msg.signals_imag_vect = list(np.imag(signals_f.T).astype(float).flatten())
+    msg.signals_real_vect = to_array(np.real(signals_f.T).ravel(), "f")
+    msg.signals_imag_vect = to_array(np.imag(signals_f.T).ravel(), "f")
     return msg
 
 
@@ -161,10 +203,10 @@ def create_correlations_message(R, freqs, mic_positions, timestamp):
     msg = Correlations()
     msg.n_mics = int(R.shape[1])
     msg.n_frequencies = len(freqs)
-    msg.frequencies = [int(f) for f in freqs]
-    msg.corr_real_vect = list(R.real.astype(float).flatten())
-    msg.corr_imag_vect = list(R.imag.astype(float).flatten())
-    msg.mic_positions = list(mic_positions.astype(float).flatten())
+    msg.frequencies = to_array(freqs, "H")
+    msg.corr_real_vect = to_array(R.real.ravel(), "d")
+    msg.corr_imag_vect = to_array(R.imag.ravel(), "d")
+    msg.mic_positions = to_array(mic_positions.ravel(), "f")
     msg.timestamp = timestamp
     return msg
 
@@ -175,8 +217,8 @@ def create_spectrum_message(spectrum, frequencies, timestamp):
     msg.timestamp = timestamp
     msg.n_frequencies = len(frequencies)
     msg.n_angles = spectrum.shape[1]
-    msg.frequencies = list(frequencies.astype(float))
-    msg.spectrum_vect = list(spectrum.astype(float).flatten())
+    msg.frequencies = to_array(frequencies, "f")
+    msg.spectrum_vect = to_array(spectrum.ravel(), "f")
     return msg
 
 
@@ -185,7 +227,7 @@ def create_doa_message(doa_estimates, timestamp):
     msg = DoaEstimates()
     msg.n_estimates = len(doa_estimates)
     msg.timestamp = timestamp
-    msg.doa_estimates_deg = list(doa_estimates.astype(float).flatten())
+    msg.doa_estimates_deg = to_array(doa_estimates.ravel(), "f")
     return msg
 
 
@@ -239,51 +281,74 @@ def read_pose_message(msg):
     return new_position, yaw, pitch, roll
 
 
+def read_planar_pose_message(msg):
+    """ Read Pose message of a pose with zero pitch and roll.
+
+    Cheaper than read_pose_message, as only the yaw angle is computed.
+    """
+    new_position = np.array(
+        (msg.pose.position.x, msg.pose.position.y, msg.pose.position.z)
+    )
+    q = msg.pose.orientation
+    yaw = math.degrees(
+        math.atan2(2 * (q.w * q.z + q.x * q.y), 1 - 2 * (q.y * q.y + q.z * q.z))
+    )
+    return new_position, yaw
+
+
 def read_pose_raw_message(msg):
     """ Read PoseRaw message.  """
-    from scipy.spatial.transform import Rotation
-
-    v_local = np.array((msg.vx, msg.vy, 0))
     r_world = np.array((msg.x, msg.y, msg.z))
     yaw = msg.yaw_deg
     yaw_rate = msg.yaw_rate_deg
-    r = Rotation.from_euler("z", yaw, degrees=True)
-    v_world = r.apply(v_local)[:2]
+    # rotate the local velocity around z by yaw.
+    cos_yaw = math.cos(math.radians(yaw))
+    sin_yaw = math.sin(math.radians(yaw))
+    v_world = np.array(
+        (cos_yaw * msg.vx - sin_yaw * msg.vy, sin_yaw * msg.vx + cos_yaw * msg.vy)
+    )
     return r_world, v_world, yaw, yaw_rate
 
 
-def read_signals_message(msg):
-    """ Read Signals message.  """
-    mic_positions = np.array(msg.mic_positions).reshape((msg.n_mics, -1))
-    signals = np.array(msg.signals_vect)
+def read_signals_message(msg, dtype=float):
+    """ Read Signals message.
+
+    :param dtype: dtype of the returned signals.
+    """
+    mic_positions = from_array(msg.mic_positions).reshape((msg.n_mics, -1))
+    signals = from_array(msg.signals_vect, dtype)
     signals = signals.reshape((msg.n_mics, msg.n_buffer))
     return mic_positions, signals
 
 
 def read_signals_freq_message(msg):
     """ Read SignalsFreq message.  """
-    mic_positions = np.array(msg.mic_positions).reshape((msg.n_mics, -1))
-    signals_f = np.array(msg.signals_real_vect) + 1j * np.array(msg.signals_imag_vect)
+    mic_positions = from_array(msg.mic_positions).reshape((msg.n_mics, -1))
+    # the fields are float32, so complex64 keeps their full precision.
+    signals_f = from_complex_arrays(
+        msg.signals_real_vect, msg.signals_imag_vect, np.complex64
+    )
     signals_f = signals_f.reshape((msg.n_mics, msg.n_frequencies)).T
-    freqs = np.array(msg.frequencies)
+    freqs = from_array(msg.frequencies, int)
     return mic_positions, signals_f[freqs > 0, :], freqs[freqs > 0]
 
 
 def read_correlations_message(msg):
     """ Read Correlations message. """
     if msg.mic_positions:
-        mic_positions = np.array(msg.mic_positions).reshape((msg.n_mics, -1))
+        mic_positions = from_array(msg.mic_positions).reshape((msg.n_mics, -1))
     else:
         mic_positions = None
-    frequencies = np.array(msg.frequencies).astype(np.float)  # [10, 100, 1000]
-    R = np.array(msg.corr_real_vect) + 1j * np.array(msg.corr_imag_vect)
+    frequencies = from_array(msg.frequencies)  # [10, 100, 1000]
+    # the correlations are sent in high precision, which the MVDR inverse needs.
+    R = from_complex_arrays(msg.corr_real_vect, msg.corr_imag_vect)
     R = R.reshape((len(frequencies), msg.n_mics, msg.n_mics))
     return mic_positions, R, frequencies
 
 
 def read_spectrum_message(msg):
     """ Read Spectrum message. """
-    spectrum = np.array(msg.spectrum_vect).reshape((msg.n_frequencies, msg.n_angles))
-    frequencies = np.array(msg.frequencies)
+    spectrum = from_array(msg.spectrum_vect).reshape((msg.n_frequencies, msg.n_angles))
+    frequencies = from_array(msg.frequencies)
     theta_scan = np.linspace(0, 360, msg.n_angles)
     return spectrum, frequencies, theta_scan
@@ -21,7 +21,7 @@ from audio_interfaces.msg import Signals
 from audio_interfaces_py.messages import create_signals_message, create_pose_message
 from audio_interfaces_py.node_with_params import NodeWithParams
 from audio_simulation.geometry import (
-    global_positions_from_2d,
+    global_positions_from_3d,
     get_relative_movement,
 )
 from crazyflie_description_py.parameters import (
@@ -103,6 +103,13 @@ class CrazyflieSimulation(NodeWithParams):
     # constants
     mic_positions = np.array(MIC_POSITIONS)  # 4 x 2
     buzzer_position = np.array(BUZZER_POSITION)  # 1 x 2
+    # local 3D positions, padded once instead of at every pose update.
+    mic_positions_3d = np.c_[
+        mic_positions, np.full(len(mic_positions), HEIGHT_MIC_ARRAY)
+    ]
+    buzzer_position_3d = np.c_[
+        buzzer_position, np.full(len(buzzer_position), HEIGHT_BUZZER)
+    ]
     speaker_position_global = np.array(SPEAKER_POSITION)  # 3,
 
     def __init__(self):
@@ -277,12 +284,12 @@ class CrazyflieSimulation(NodeWithParams):
         self.end_idx = min(len(self.buzzer_signal), len(self.speaker_signal))
 
     def update_positions(self):
-        mic_positions_global = global_positions_from_2d(
-            CrazyflieSimulation.mic_positions, self.current_pose, z=HEIGHT_MIC_ARRAY,
+        mic_positions_global = global_positions_from_3d(
+            CrazyflieSimulation.mic_positions_3d, self.current_pose
         )[:, :DIM]
 
-        buzzer_position_global = global_positions_from_2d(
-            CrazyflieSimulation.buzzer_position, self.current_pose, z=HEIGHT_BUZZER,
+        buzzer_position_global = global_positions_from_3d(
+            CrazyflieSimulation.buzzer_position_3d, self.current_pose
         )[:, :DIM]
 
         for pos in [pos for pos in mic_positions_global] + [buzzer_position_global]:
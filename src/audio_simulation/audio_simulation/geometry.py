@@ -1,6 +1,9 @@
 """
 geometry.py: Some geometry functions useful across all simulations.
 """
+import functools
+import math
+
 import numpy as np
 from scipy.spatial.transform import Rotation as R
 
@@ -21,7 +24,9 @@ def global_positions_from_2d(local_positions_2D, msg_pose, z=0):
     """
     assert local_positions_2D.shape[1] == 2
     n_pos = local_positions_2D.shape[0]
-    local_positions_3D = np.c_[local_positions_2D, np.full((n_pos, 1), z)]
+    local_positions_3D = np.empty((n_pos, 3))
+    local_positions_3D[:, :2] = local_positions_2D
+    local_positions_3D[:, 2] = z
     return global_positions_from_3d(local_positions_3D, msg_pose)
 
 
@@ -34,43 +39,53 @@ def global_positions_from_3d(local_positions_3D, msg_pose, z=0):
     :return: global positions (n_mics x 3)
     """
     assert local_positions_3D.shape[1] == 3
-    rotation = np.array(
-        [
-            msg_pose.orientation.x,
-            msg_pose.orientation.y,
-            msg_pose.orientation.z,
-            msg_pose.orientation.w,
-        ]
+    rotation = (
+        msg_pose.orientation.x,
+        msg_pose.orientation.y,
+        msg_pose.orientation.z,
+        msg_pose.orientation.w,
     )
     translation = np.array(
         [msg_pose.position.x, msg_pose.position.y, msg_pose.position.z]
     )
-    n_pos = local_positions_3D.shape[0]
-    rot = R.from_quat(rotation)
-    global_positions = rot.apply(local_positions_3D) + translation
+    global_positions = local_positions_3D @ get_rotation_matrix(rotation).T
+    global_positions += translation
     return global_positions
 
 
+@functools.lru_cache(maxsize=128)
+def get_rotation_matrix(quaternion):
+    """
+    Rotation matrix of the given quaternion, cached because the pose often
+    does not change between consecutive calls.
+
+    :param quaternion: tuple (x, y, z, w)
+    :return: read-only rotation matrix (3 x 3)
+    """
+    matrix = R.from_quat(quaternion).as_matrix()
+    matrix.flags.writeable = False
+    return matrix
+
+
 def get_relative_movement(pose1, pose2):
     """ Get the step length (in m) and rotation (in radiants) 
     between pose1 and pose2.
 
     """
-    step_length = np.linalg.norm(
-        [
-            pose2.position.x - pose1.position.x,
-            pose2.position.y - pose1.position.y,
-            pose2.position.z - pose1.position.z,
-        ]
+    dx = pose2.position.x - pose1.position.x
+    dy = pose2.position.y - pose1.position.y
+    dz = pose2.position.z - pose1.position.z
+    step_length = math.sqrt(dx * dx + dy * dy + dz * dz)
+
+    # magnitude of the rotation r2 * r1^-1 ("angle2 - angle1"), in radiants,
+    # using that it equals 2 * arccos(|<q1, q2>|) for unit quaternions.
+    q1, q2 = pose1.orientation, pose2.orientation
+    dot = q1.x * q2.x + q1.y * q2.y + q1.z * q2.z + q1.w * q2.w
+    norms = math.sqrt(
+        (q1.x * q1.x + q1.y * q1.y + q1.z * q1.z + q1.w * q1.w)
+        * (q2.x * q2.x + q2.y * q2.y + q2.z * q2.z + q2.w * q2.w)
     )
-    r1, r2 = [
-        R.from_quat(
-            [p.orientation.x, p.orientation.y, p.orientation.z, p.orientation.w]
-        )
-        for p in [pose1, pose2]
-    ]
-    r = r2 * r1.inv()  # "get angle2 - angle1"
-    rotation = r.magnitude()  # magnitude of rotation, in radiants
+    rotation = 2 * math.acos(min(abs(dot) / norms, 1.0))
     return [step_length, rotation]
 
 
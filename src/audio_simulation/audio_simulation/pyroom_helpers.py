@@ -33,8 +33,6 @@ def get_max_delay(room, n_extra_samples=100):
 
 def simulate_truncated(pyroom, start_idx, n_buffer, verbose=False):
     """ Simulate audio if we are interested in n_buffer samples starting from start_idx. """
-    from copy import deepcopy
-
     max_delay = get_max_delay(pyroom)
 
     # assert max_delay <= start_idx, (max_delay, start_idx)
@@ -53,9 +51,9 @@ def simulate_truncated(pyroom, start_idx, n_buffer, verbose=False):
     if verbose:
         print(f"length {max_idx - min_idx}: took {(time.time() - t1) * 1000:.0f}ms")
 
-    simulated_signal = deepcopy(
-        pyroom.mic_array.signals[:, max_delay : max_delay + n_buffer]
-    )
+    simulated_signal = pyroom.mic_array.signals[
+        :, max_delay : max_delay + n_buffer
+    ].copy()
     assert (
         simulated_signal.shape[1] == n_buffer
     ), f"{simulated_signal.shape}, {n_buffer}, {max_delay}, {min_idx}"
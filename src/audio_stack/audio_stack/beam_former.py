@@ -5,6 +5,7 @@
 beam_former.py: Beamformer class for direction-of-arrival (DOA) estimation.
 """
 
+import functools
 import math
 import sys
 import os
@@ -16,6 +17,7 @@ from scipy.spatial.transform import Rotation
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir + "/../../../crazyflie-audio/python/")
 from algos_beamforming import get_lcmv_beamformer_fast, get_das_beamformer, get_powers
+from constants import SPEED_OF_SOUND
 
 
 LAMDA = 1e-5  # 1e-10
@@ -30,14 +32,14 @@ def normalize_rows(matrix, method):
         return matrix
 
     if method == "zero_to_one":
-        normalized = matrix - np.nanmin(matrix, axis=1, keepdims=True)
-        denom = np.nanmax(matrix, axis=1, keepdims=True) - np.nanmin(
-            matrix, axis=1, keepdims=True
-        )
+        min_matrix = np.nanmin(matrix, axis=1, keepdims=True)
+        normalized = matrix - min_matrix
+        denom = np.nanmax(normalized, axis=1, keepdims=True)
         if np.any(denom > 0):
             normalized /= denom
-            np.testing.assert_allclose(np.nanmax(normalized, axis=1), 1)
-            np.testing.assert_allclose(np.nanmin(normalized, axis=1), 0)
+            if __debug__:
+                np.testing.assert_allclose(np.nanmax(normalized, axis=1), 1)
+                np.testing.assert_allclose(np.nanmin(normalized, axis=1), 0)
     elif method == "zero_to_one_all":
         denom = np.nanmax(matrix) - np.nanmin(matrix)
         if denom > 0:
@@ -46,12 +48,9 @@ def normalize_rows(matrix, method):
             assert np.nanmin(normalized) == 0, np.nanmin(normalized)
     elif method == "sum_to_one":
         # first make sure values are between 0 and 1 (otherwise division can lead to errors)
-        denom = np.nanmax(matrix, axis=1, keepdims=True) - np.nanmin(
-            matrix, axis=1, keepdims=True
-        )
-        matrix = (matrix - np.nanmin(matrix, axis=1, keepdims=True)) / denom
-        sum_matrix = np.sum(matrix, axis=1, keepdims=True)
-        normalized = matrix / sum_matrix
+        normalized = matrix - np.nanmin(matrix, axis=1, keepdims=True)
+        normalized /= np.nanmax(normalized, axis=1, keepdims=True)
+        normalized /= np.sum(normalized, axis=1, keepdims=True)
         # np.testing.assert_allclose(np.sum(normalized, axis=1), 1.0, rtol=1e-5)
     elif method in ["none", None]:
         normalized = matrix
@@ -65,11 +64,9 @@ def normalize_rows(matrix, method):
 
 def combine_rows(matrix, method, keepdims=False):
     if method == "product":
-        # do the product in log domain for numerical reasons
-        # sum(log10(matrix)) = log10(product(matrix))
-        combined_matrix = np.power(
-            10, np.nansum(np.log10(matrix), axis=0, keepdims=keepdims)
-        )
+        # the rows are normalized, so the direct product does not overflow
+        # and underflows just like 10 ** sum(log10(matrix)) would.
+        combined_matrix = np.nanprod(matrix, axis=0, keepdims=keepdims)
     elif method == "sum":
         combined_matrix = np.nansum(matrix, axis=0, keepdims=keepdims)
     else:
@@ -89,6 +86,42 @@ def rotate_mics(mics, orientation_deg=0):
     return mics_rotated.T
 
 
+def rotate_mics_batch(mics, orientations_deg):
+    """
+    :param mics: mic positions (n_mics, 2)
+    :param orientations_deg: orientations in degrees (n_orientations,)
+    :return mics_rotated: (n_orientations, n_mics, 2)
+    """
+    angles = np.asarray(orientations_deg, dtype=float) / 180 * np.pi
+    cos, sin = np.cos(angles), np.sin(angles)
+    R = np.array([[cos, -sin], [sin, cos]]).transpose(2, 0, 1)  # n_orientations x 2 x 2
+    return np.einsum("kij,mj->kmi", R, mics)
+
+
+@functools.lru_cache(maxsize=16)
+def get_das_beamformers(theta_scan_bytes, frequencies_bytes, mic_positions_bytes):
+    """ DAS beamformers of all angles, cached because the frequencies and mic
+    positions usually do not change between frames.
+
+    :param theta_scan_bytes: bytes of the float angles (in radiants).
+    :param frequencies_bytes: bytes of the float frequencies (in Hz).
+    :param mic_positions_bytes: bytes of the float (n_mics x 2) mic positions.
+
+    :return: read-only beamformers of shape (n_angles x n_frequencies x n_mics)
+    """
+    theta_scan = np.frombuffer(theta_scan_bytes)
+    frequencies_hz = np.frombuffer(frequencies_bytes)
+    mic_positions = np.frombuffer(mic_positions_bytes).reshape((-1, 2))
+    directions = np.c_[np.cos(theta_scan), np.sin(theta_scan)]
+    delays = directions @ (mic_positions[0] - mic_positions).T / SPEED_OF_SOUND
+    exponent = 2 * np.pi * frequencies_hz[None, :, None] * delays[:, None, :]
+    # complex64, so that complex64 correlations are not upcast in the spectra.
+    beamformers = np.exp(-1j * exponent).astype(np.complex64)
+    beamformers /= mic_positions.shape[0]
+    beamformers.flags.writeable = False
+    return beamformers
+
+
 class BeamFormer(object):
     # TODO(FD): make this somewhat more flexible
     theta_scan_deg = np.linspace(0, 360, 361)
@@ -129,20 +162,52 @@ class BeamFormer(object):
         """
         if mic_positions is None:
             mic_positions = self.mic_positions
-        spectrum = np.empty((len(frequencies_hz), len(self.theta_scan)))
-        for i, theta in enumerate(self.theta_scan):
-            H_mvdr = self.beamform_mvdr(
-                R, theta, frequencies_hz, mic_positions, lamda, inverse
-            )
 
-            spectrum[:, i] = get_powers(H_mvdr, R)
-        return spectrum
+        if inverse != "pinv":
+            spectrum = np.empty((len(frequencies_hz), len(self.theta_scan)))
+            for i, theta in enumerate(self.theta_scan):
+                H_mvdr = self.beamform_mvdr(
+                    R, theta, frequencies_hz, mic_positions, lamda, inverse
+                )
+                spectrum[:, i] = get_powers(H_mvdr, R)
+            return spectrum
+
+        # same as beamform_mvdr, for all angles at once.
+        # the regularized inverse is computed in complex128: in single
+        # precision, lamda is lost in the rounding of R and the inverse of a
+        # (close to) rank-deficient R blows up.
+        R_double = R.astype(np.complex128)
+        n_mics = mic_positions.shape[0]
+        C = self.beamform_das_all(frequencies_hz, mic_positions) * n_mics
+        C = C.astype(np.complex128)
+        eye = np.eye(R.shape[1])
+        R_inv = np.linalg.pinv(R_double + lamda * eye[None, :, :], rcond=0)
+        R_inv_C = np.einsum("fmn,tfn->tfm", R_inv, C, optimize=True)
+        H_mvdr = R_inv_C / np.einsum("tfm,tfm->tf", C.conj(), R_inv_C)[:, :, None]
+        spectrum = np.abs(
+            np.einsum("tfm,fmn,tfn->ft", H_mvdr.conj(), R_double, H_mvdr, optimize=True)
+        )
+        return spectrum.astype(R.real.dtype)
 
     def beamform_das(self, theta, frequencies_hz, mic_positions=None):
         if mic_positions is None:
             mic_positions = self.mic_positions
         return get_das_beamformer(theta, frequencies_hz, mic_positions)
 
+    def beamform_das_all(self, frequencies_hz, mic_positions=None):
+        """ Get DAS beamformers of all angles in theta_scan.
+
+        :return: read-only beamformers of shape (n_angles x n_frequencies x n_mics)
+        """
+        if mic_positions is None:
+            mic_positions = self.mic_positions
+        assert mic_positions.shape[1] == 2, "only 2D mic positions are supported."
+        return get_das_beamformers(
+            np.asarray(self.theta_scan, dtype=float).tobytes(),
+            np.asarray(frequencies_hz, dtype=float).tobytes(),
+            np.asarray(mic_positions, dtype=float).tobytes(),
+        )
+
     def get_das_spectrum(self, R, frequencies, mic_positions=None):
         """ Get DAS spatial spectrum.
 
@@ -151,11 +216,10 @@ class BeamFormer(object):
         if mic_positions is None:
             mic_positions = self.mic_positions
 
-        spectrum = np.empty((len(frequencies), len(self.theta_scan)))
-        for i, theta in enumerate(self.theta_scan):
-            H_das = self.beamform_das(theta, frequencies, mic_positions)
-            spectrum[:, i] = get_powers(H_das, R)
-        return spectrum
+        H_das = self.beamform_das_all(frequencies, mic_positions)
+        return np.abs(
+            np.einsum("tfm,fmn,tfn->ft", H_das.conj(), R, H_das, optimize=True)
+        )
 
     def get_correlation(self, signals_f):
         """ Get autocorrelation tensor. 
@@ -164,12 +228,11 @@ class BeamFormer(object):
         if signals_f.shape[0] < signals_f.shape[1]:
             # print("Warning: less frequency bins than mics. Did you forget to transpose signals_f?")
             pass
-        return (
-            1
-            / signals_f.shape[1]
-            * signals_f[:, :, None]
-            @ signals_f[:, None, :].conj()
-        )
+        # outer products of all frequencies in one pass, instead of
+        # n_frequencies (n_mics x 1) @ (1 x n_mics) matrix products.
+        R = np.einsum("fm,fn->fmn", signals_f, signals_f.conj())
+        R *= 1 / signals_f.shape[1]
+        return R
 
     def shift_spectrum(self, spectrum, delta_deg):
         """ shift spectrum by delta_deg. 
@@ -256,7 +319,7 @@ class BeamFormer(object):
         self.signals_f_aligned = np.full(
             (len(frequencies), combination_n * self.mic_positions.shape[0]),
             np.nan,
-            dtype=np.complex,
+            dtype=np.complex128,
         )
         self.multi_mic_positions = np.full(
             (combination_n * self.mic_positions.shape[0], self.mic_positions.shape[1]),
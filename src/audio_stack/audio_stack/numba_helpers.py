@@ -0,0 +1,28 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+numba_helpers.py: Optional numba support, shared by all numba kernels.
+
+Without numba, njit is a no-op decorator and prange is range, so the
+kernels run as plain python (or are replaced by their numpy/scipy fallbacks).
+"""
+
+try:
+    import numba
+    from numba import njit, prange
+except ImportError:  # numba is optional, fall back to plain python loops.
+    numba = None
+
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+    prange = range
+
+NUMBA_AVAILABLE = numba is not None
+
+
+def set_num_threads(n_threads):
+    """ Limit the threads of parallel numba kernels, e.g. inside worker processes. """
+    if NUMBA_AVAILABLE:
+        numba.set_num_threads(n_threads)
@@ -6,12 +6,13 @@ processor.py: Process raw audio signals and publish frequency bins signals_f
 This is the digital twin of what the microphone board does. 
 """
 
+import functools
 import os
 import sys
 import time
 
 import numpy as np
-from scipy import signal
+from scipy import fft, signal
 
 import rclpy
 
@@ -23,9 +24,11 @@ from bin_selection import select_frequencies as embedded_select_frequencies
 from audio_interfaces.msg import Signals, SignalsFreq
 from audio_interfaces_py.messages import (
     create_signals_freq_message,
-    read_signals_message,
+    from_array,
+    to_array,
 )
 from audio_interfaces_py.node_with_params import NodeWithParams
+from audio_stack.numba_helpers import NUMBA_AVAILABLE, njit, prange
 from audio_stack.parameters import TUKEY_ALPHA
 
 # Denoising method, available:
@@ -34,6 +37,7 @@ from audio_stack.parameters import TUKEY_ALPHA
 # - "single" (keep only single frequency)
 METHOD_NOISE = ""
 METHOD_NOISE_DICT = {"bandpass": {"fmin": 100, "fmax": 300, "order": 3}}
+BANDPASS_RS_DB = 40  # stopband attenuation of the cheby2 bandpass filter
 
 # Windowing method, available:
 # - "" (no window)
@@ -43,29 +47,68 @@ METHOD_NOISE_DICT = {"bandpass": {"fmin": 100, "fmax": 300, "order": 3}}
 METHOD_WINDOW = "tukey"
 
 
-def get_stft(signals, fs, method_window="", method_noise=""):
+@functools.lru_cache(maxsize=8)
+def get_bandpass_sos(fs, fmin, fmax, order):
+    """ Second-order sections of the cheby2 bandpass filter, designed once per fs. """
+    return signal.iirfilter(
+        order,
+        [fmin, fmax],
+        rs=BANDPASS_RS_DB,
+        btype="band",
+        ftype="cheby2",
+        fs=fs,
+        output="sos",
+    )
+
+
+def _sosfilt_rows(sos, x):
+    """ Same as scipy.signal.sosfilt(sos, x, axis=1), as direct form II transposed
+    biquads, run in parallel over the rows (mics) of x.
+    """
+    n_rows, n_samples = x.shape
+    y = np.empty_like(x)
+    for i in prange(n_rows):
+        z = np.zeros((sos.shape[0], 2))
+        for n in range(n_samples):
+            xn = x[i, n]
+            for s in range(sos.shape[0]):
+                yn = sos[s, 0] * xn + z[s, 0]
+                z[s, 0] = sos[s, 1] * xn - sos[s, 4] * yn + z[s, 1]
+                z[s, 1] = sos[s, 2] * xn - sos[s, 5] * yn
+                xn = yn
+            y[i, n] = xn
+    return y
+
+
+if NUMBA_AVAILABLE:
+    sosfilt_rows = njit(cache=True, fastmath=True, parallel=True)(_sosfilt_rows)
+else:
+    sosfilt_rows = functools.partial(signal.sosfilt, axis=1)
+
+
+@functools.lru_cache(maxsize=8)
+def get_window(method_window, n_buffer):
+    """ Window of given method and length, cached as n_buffer rarely changes. """
     if method_window == "tukey":
-        window = signal.tukey(signals.shape[1], alpha=TUKEY_ALPHA)
-        signals *= window
+        window = signal.windows.tukey(n_buffer, alpha=TUKEY_ALPHA)
     elif method_window == "hann":
-        window = signal.hann(signals.shape[1])
-        signals *= window
+        window = signal.windows.hann(n_buffer)
     elif method_window == "flattop":
-        window = signal.flattop(signals.shape[1])
-        signals *= window
-    elif method_window == "":
-        pass
+        window = signal.windows.flattop(n_buffer)
     else:
         raise ValueError(method_window)
+    window = window.astype(np.float32)
+    window.flags.writeable = False
+    return window
+
+
+def get_stft(signals, fs, method_window="", method_noise=""):
+    if method_window != "":
+        np.multiply(signals, get_window(method_window, signals.shape[1]), out=signals)
 
     if method_noise == "bandpass":
-        signals = filter_iir_bandpass(
-            signals,
-            Fs=fs,
-            method="cheby2",
-            plot=False,
-            **METHOD_NOISE_DICT[method_noise],
-        )
+        sos = get_bandpass_sos(fs, **METHOD_NOISE_DICT[method_noise])
+        signals = sosfilt_rows(sos, signals)
     elif method_noise == "single":
         signals = filter_iir_bandpass(
             signals,
@@ -79,11 +122,23 @@ def get_stft(signals, fs, method_window="", method_noise=""):
     else:
         ValueError(method_noise)
 
-    signals_f = np.fft.rfft(signals, n=signals.shape[1], axis=1).T  # n_samples x n_mics
-    freqs = np.fft.rfftfreq(n=signals.shape[1], d=1 / fs)
+    # scipy's pocketfft can overwrite the (already windowed) input and transform
+    # the mics in parallel, using one worker per mic.
+    signals_f = fft.rfft(
+        signals, axis=1, workers=signals.shape[0], overwrite_x=True
+    ).T  # n_samples x n_mics
+    freqs = get_frequencies(signals.shape[1], fs)
     return signals_f, freqs
 
 
+@functools.lru_cache(maxsize=16)
+def get_frequencies(n_buffer, fs):
+    """ Frequencies of the rfft bins, cached as n_buffer and fs rarely change. """
+    freqs = fft.rfftfreq(n=n_buffer, d=1 / fs)
+    freqs.flags.writeable = False
+    return freqs
+
+
 class Processor(NodeWithParams):
     """ Node to subscribe to audio/signals or audio/signals_f and publish correlations.
     """
@@ -109,6 +164,7 @@ class Processor(NodeWithParams):
             SignalsFreq, "audio/signals_f", 10
         )
         self.mic_positions = None
+        self.mic_positions_field = None  # mic_positions, converted for messages.
 
     # below overwrites base class verify_validity function.
     @staticmethod
@@ -123,7 +179,12 @@ class Processor(NodeWithParams):
     def listener_callback_signals(self, msg):
         t1 = time.time()
 
-        self.mic_positions, signals = read_signals_message(msg)
+        # the mic positions do not change, so they are only read once.
+        if (self.mic_positions is None) or (len(self.mic_positions) != msg.n_mics):
+            self.mic_positions = from_array(msg.mic_positions).reshape((msg.n_mics, -1))
+            self.mic_positions_field = to_array(self.mic_positions.ravel(), "f")
+        signals = from_array(msg.signals_vect, np.float32)
+        signals = signals.reshape((msg.n_mics, msg.n_buffer))
         signals_f, freqs = get_stft(
             signals, msg.fs, METHOD_WINDOW, METHOD_NOISE
         )  # n_samples x n_mics
@@ -135,8 +196,9 @@ class Processor(NodeWithParams):
         signals_f = signals_f[bins]
 
         msg_freq = create_signals_freq_message(
-            signals_f, freqs, self.mic_positions, msg.timestamp, None, msg.fs
+            signals_f, freqs, None, msg.timestamp, None, msg.fs
         )
+        msg_freq.mic_positions = self.mic_positions_field
         self.publisher_signals_f.publish(msg_freq)
 
         self.get_logger().info(
@@ -17,6 +17,7 @@ from geometry_msgs.msg import PoseStamped
 from audio_interfaces_py.messages import (
     create_spectrum_message,
     read_signals_freq_message,
+    to_array,
 )
 from audio_interfaces_py.node_with_params import NodeWithParams
 from audio_stack.beam_former import BeamFormer
@@ -130,7 +131,7 @@ class SpectrumEstimator(NodeWithParams):
         dynamic_spectrum = self.beam_former.get_dynamic_estimate()
 
         msg_dynamic = msg_spec
-        msg_dynamic.spectrum_vect = list(dynamic_spectrum.astype(float).flatten())
+        msg_dynamic.spectrum_vect = to_array(dynamic_spectrum.ravel(), "f")
         self.publisher_spectrum_combined.publish(msg_dynamic)
         self.get_logger().info(
             f"Published dynamic spectrum after {time.time() - t1:.2f}s."
@@ -144,7 +145,7 @@ class SpectrumEstimator(NodeWithParams):
         spectrum_multi = self.beam_former.get_multi_estimate(method=self.bf_method)
 
         msg_multi = msg_spec
-        msg_multi.spectrum_vect = list(spectrum_multi.astype(float).flatten())
+        msg_multi.spectrum_vect = to_array(spectrum_multi.ravel(), "f")
         self.publisher_spectrum_multi.publish(msg_multi)
         self.get_logger().info(
             f"Published multi spectrum after {time.time() - t1:.2f}s."
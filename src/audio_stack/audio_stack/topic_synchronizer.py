@@ -1,6 +1,8 @@
 #! /usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import bisect
+from collections import deque
 
 from audio_interfaces_py.messages import convert_sec_nanosec_to_ms
 
@@ -28,8 +30,9 @@ class TopicSynchronizer(object):
         self.logger = logger
         self.n_buffer = n_buffer
         if n_buffer > 1:
-            self.buffer = [None] * n_buffer
-            self.buffer_idx = 0
+            # messages and their times, from oldest to latest.
+            self.buffer = deque(maxlen=n_buffer)
+            self.times = deque(maxlen=n_buffer)
 
     def get_latest_message(
         self, timestamp, logger=None, allow_reuse=True, verbose=False
@@ -56,31 +59,13 @@ class TopicSynchronizer(object):
                     f" {timestamp}, all times currently in buffer: {self.get_times()}"
                 )
             if self.n_buffer > 1:
-                min_idx = (self.buffer_idx - 1) % self.n_buffer
-                max_idx = (self.buffer_idx - self.n_buffer) % self.n_buffer
-                if False and logger:
-                    logger.warn(
-                        f"Checking {get_time(self.buffer[max_idx])} to {get_time(self.buffer[min_idx])}"
-                    )
-                # Starting with latest time (buffer_idx - 1), check until the time
-                # is acceptable. Worse case, we return buffer_idx + 1, which is the
-                # oldest element in the buffer.
-                for i in range(1, self.n_buffer + 1):
-                    idx = (self.buffer_idx - i) % self.n_buffer
-                    time = get_time(self.buffer[idx])
-                    if False and logger:
-                        logger.warn(f"Checking {min_time} < {time} < {timestamp}")
-                    if (time is not None) and (time < timestamp):
-                        break
-                    elif (time is not None) and allow_reuse and (time == timestamp):
-                        break
-
-                    # example: [msg0, msg1, None0, None1, None2]
-                    # check msg1 (idx 0), too new, msg0 (idx 1), too new, check None2: return msg0
-                    elif time is None:
-                        idx = (idx + 1) % self.n_buffer
-                        break
-                return self.buffer[idx]
+                # Find the latest message older than timestamp (or at timestamp,
+                # if allow_reuse). Worst case, we return the oldest message in the buffer.
+                if allow_reuse:
+                    idx = bisect.bisect_right(self.times, timestamp) - 1
+                else:
+                    idx = bisect.bisect_left(self.times, timestamp) - 1
+                return self.buffer[max(idx, 0)]
             else:
                 return self.latest_message
         elif latest_time == timestamp:
@@ -101,10 +86,9 @@ class TopicSynchronizer(object):
         self.latest_message = msg
 
         if self.n_buffer > 1:
-            self.buffer[self.buffer_idx] = msg
-            self.buffer_idx = (self.buffer_idx + 1) % self.n_buffer
+            self.buffer.append(msg)
+            self.times.append(get_time(msg))
 
     def get_times(self):
         if self.n_buffer > 1:
-            times = [get_time(msg) for msg in self.buffer]
-            return times
+            return list(self.times)
@@ -53,6 +53,9 @@ MIN_YLIM = 1e-13  # set to -inf for no effect.
 
 DEBUG = True  # some extra verbose stuff
 
+# constant for fixed N_BUFFER and FS, so computed only once.
+ALL_FREQUENCIES = np.fft.rfftfreq(n=N_BUFFER, d=1 / FS)
+
 
 class Gateway(Node):
     # parameter default values, will be overwritten by
@@ -116,6 +119,9 @@ class Gateway(Node):
 
         self.reader_crtp = reader_crtp
 
+        # reused between audio packets, (re)allocated when the number of frequencies changes.
+        self.signals_f = None
+
         self.add_on_set_parameters_callback(self.set_params)
 
         # fill parameters with default values, unless otherwise specified
@@ -203,7 +209,7 @@ class Gateway(Node):
             self.get_logger().info("No data yet. Not publishing")
             return
 
-        all_frequencies = np.fft.rfftfreq(n=N_BUFFER, d=1 / FS)
+        all_frequencies = ALL_FREQUENCIES
         n_frequencies = len(fbins)
 
         # the only allowed duplicates are 0
@@ -221,10 +227,16 @@ class Gateway(Node):
 
         frequencies = all_frequencies[fbins]
 
-        signals_f = np.zeros((N_MICS, n_frequencies), dtype=np.complex128)
-        for i in range(N_MICS):
-            signals_f[i].real = signals_f_vect[i :: N_MICS * 2]
-            signals_f[i].imag = signals_f_vect[i + N_MICS :: N_MICS * 2]
+        # the audio data is float32, so complex64 keeps its full precision.
+        # signals_f_vect is ordered as (n_frequencies x [real, imag] x n_mics).
+        signals_f_vect = np.asarray(signals_f_vect, dtype=np.float32).reshape(
+            (n_frequencies, 2, N_MICS)
+        )
+        if (self.signals_f is None) or (self.signals_f.shape[1] != n_frequencies):
+            self.signals_f = np.empty((N_MICS, n_frequencies), dtype=np.complex64)
+        signals_f = self.signals_f
+        signals_f.real = signals_f_vect[:, 0, :].T
+        signals_f.imag = signals_f_vect[:, 1, :].T
 
         window_type = self.get_parameter("window_type").value
         if window_type is not None:
@@ -240,11 +252,10 @@ class Gateway(Node):
                 self.get_logger().warn(f"at indices: {xx}, {yy}")
                 self.get_logger().warn(f"values: {abs_signals_f[xx, yy]}")
 
-        mic_positions_arr = np.array(MIC_POSITIONS)
         msg = create_signals_freq_message(
             signals_f.T,
             frequencies,
-            mic_positions_arr,
+            MIC_POSITIONS,
             self.reader_crtp.audio_dict["timestamp"],
             self.reader_crtp.audio_dict["audio_timestamp"],
             FS,
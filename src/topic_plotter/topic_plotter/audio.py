@@ -61,6 +61,7 @@ class AudioPlotter(NodeWithParams):
         ymax=np.inf,
         xmin=-np.inf,
         xmax=np.inf,
+        blit=False,
     ):
         if not name in self.plotter_dict.keys():
             self.plotter_dict[name] = LivePlotter(
@@ -72,6 +73,7 @@ class AudioPlotter(NodeWithParams):
                 min_xlim=xmin,
                 ax=self.axs[name],
                 fig=self.fig,
+                blit=blit,
             )
             self.plotter_dict[name].ax.set_xlabel(xlabel)
             self.plotter_dict[name].ax.set_ylabel(ylabel)
@@ -87,7 +89,9 @@ class AudioPlotter(NodeWithParams):
             xmax=self.current_params["max_freq"],
         )
 
-        if msg.n_frequencies != self.current_n_frequencies:
+        # the lines, and with them the legend, change with the number of frequencies.
+        new_lines = msg.n_frequencies != self.current_n_frequencies
+        if new_lines:
             self.plotter_dict["signals frequency"].clear()
 
         __, signals_f, freqs = read_signals_freq_message(msg)
@@ -127,12 +131,21 @@ class AudioPlotter(NodeWithParams):
         self.plotter_dict["signals frequency"].ax.set_ylim(
             self.current_params["min_amp"], self.current_params["max_amp"]
         )
-        self.plotter_dict["signals frequency"].ax.legend(loc="lower left")
+        if new_lines:
+            self.plotter_dict["signals frequency"].ax.legend(loc="lower left")
         self.fig.canvas.draw()
+        # the full draw skips the animated lines of the blitted time plot.
+        if "signals time" in self.plotter_dict:
+            self.plotter_dict["signals time"].draw()
 
     def listener_callback_signals(self, msg):
+        # only the lines of this plot change between messages, so use blitting.
         self.init_plotter(
-            "signals time", xlabel="time idx [-]", ylabel="magnitude [-]", log=False
+            "signals time",
+            xlabel="time idx [-]",
+            ylabel="magnitude [-]",
+            log=False,
+            blit=True,
         )
         __, signals = read_signals_message(msg)
         labels = [f"mic {i}" for i in range(msg.n_mics)]
@@ -145,9 +158,11 @@ class AudioPlotter(NodeWithParams):
         )
         if self.title is None:
             self.fig.suptitle(f"time (ms): {msg.timestamp}", y=0.9)
+            # the title is outside of the blitted axis, so draw the whole figure.
+            self.plotter_dict["signals time"].background = None
         self.current_n_buffer = msg.n_buffer
         self.plotter_dict["signals time"].ax.set_ylim(YMIN_TIME, YMAX_TIME)
-        self.fig.canvas.draw()
+        self.plotter_dict["signals time"].draw()
 
     def custom_set_params(self):
         xmin = self.current_params["min_freq"]
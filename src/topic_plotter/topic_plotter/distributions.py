@@ -68,7 +68,7 @@ class DistributionsPlotter(Node):
         distances, probs = read_distribution_message(msg_dist)
         if self.y_labels[name] is None:
             self.y_labels[name] = distances
-            self.results_matrix[name] = np.zeros((len(distances), N_TIMES), np.float)
+            self.results_matrix[name] = np.zeros((len(distances), N_TIMES), float)
 
         self.x_labels[name] = np.r_[
             self.x_labels[name][1:], round(msg_dist.timestamp * 1e-3, 1)
@@ -6,9 +6,11 @@ geometry.py:
 """
 
 from copy import deepcopy
+import time
 
 import rclpy
 from rclpy.node import Node
+from rclpy.qos import QoSProfile, HistoryPolicy, ReliabilityPolicy
 from geometry_msgs.msg import PoseStamped
 
 import numpy as np
@@ -17,6 +19,7 @@ from audio_interfaces.msg import PoseRaw, DoaEstimates, GroundTruth
 from audio_interfaces_py.messages import (
     read_pose_raw_message,
     read_pose_message,
+    read_planar_pose_message,
     convert_stamp_to_ms,
 )
 from audio_stack.topic_synchronizer import TopicSynchronizer
@@ -38,25 +41,38 @@ YLABEL = "y [m]"
 
 Z_THRESHOLD_M = 0  # 0.3  # do not plot poses below this threshold
 
+MAX_REDRAW_HZ = 20  # default of the max_redraw_hz parameter
+ERROR_LOG_PERIOD_S = 1.0  # minimum time between logs of the DOA error
+
+# for plotting, only the newest pose and doa messages matter, so
+# we do not want them to queue up (or be resent) while we are drawing.
+PLOT_QOS = QoSProfile(
+    history=HistoryPolicy.KEEP_LAST,
+    depth=1,
+    reliability=ReliabilityPolicy.BEST_EFFORT,
+)
+
 PLOT_POSE = False
 PLOT_RAW = True
 PLOT_IMU = False
 
-# data is matrix where each column contains x, y, yaw.
+# data is ring buffer where each column contains x, y, yaw.
+# unfilled entries are nan (not None), so the buffers are plain float arrays
+# which matplotlib can use without converting them on every update.
+# float32 is precise enough for plotting poses, but not for the times in ms.
 POSE_DICT = {
     "index": -1,
-    "data": np.full((3, MAX_LENGTH), None),
+    "data": np.full((3, MAX_LENGTH), np.nan, dtype=np.float32),
     "start_time": None,
-    "time": np.full(MAX_LENGTH, None),
+    "time": np.full(MAX_LENGTH, np.nan),
 }
 
 
 def plot_room(ax):
+    from matplotlib.patches import Rectangle
+
     x, y = ROOM_DIM[:2]
-    ax.plot([0, 0], [0, y], color="black")
-    ax.plot([x, x], [0, y], color="black")
-    ax.plot([0, x], [0, 0], color="black")
-    ax.plot([0, x], [y, y], color="black")
+    ax.add_patch(Rectangle((0, 0), x, y, fill=False, edgecolor="black"))
 
 
 def plot_source(ax):
@@ -85,17 +101,27 @@ class GeometryPlotter(Node):
         self.plotter_dict = {}
         self.pose_dict = {}
 
+        # the callbacks only store the new data, and the figures are updated
+        # with the latest data by a timer, at most at max_redraw_hz. This way
+        # the executor is not blocked by plotting while messages are waiting.
+        max_redraw_hz = self.declare_parameter("max_redraw_hz", MAX_REDRAW_HZ).value
+        self.pending_updates = {}  # name: pose_dict
+        self.doa_estimates = None
+        self.n_legend_labels = {}
+        self.create_timer(1.0 / max_redraw_hz, self.plot_callback)
+
         if PLOT_RAW or PLOT_IMU:
             self.subscription_pose_raw = self.create_subscription(
-                PoseRaw, "geometry/pose_raw", self.listener_callback_pose_raw, 10
+                PoseRaw, "geometry/pose_raw", self.listener_callback_pose_raw, PLOT_QOS
             )
 
         if PLOT_POSE:
             self.subscription_pose = self.create_subscription(
-                PoseStamped, "geometry/pose", self.listener_callback_pose, 10
+                PoseStamped, "geometry/pose", self.listener_callback_pose, PLOT_QOS
             )
             # need no starting position for pose as it has absolute positions
             self.pose_dict["pose"] = deepcopy(POSE_DICT)
+            self.pose_checked = False
 
         if PLOT_RAW:
             self.pose_dict["raw"] = deepcopy(POSE_DICT)
@@ -107,12 +133,17 @@ class GeometryPlotter(Node):
             )
 
         self.subscription_doa = self.create_subscription(
-            DoaEstimates, "geometry/doa_estimates", self.listener_callback_doa, 10,
+            DoaEstimates,
+            "geometry/doa_estimates",
+            self.listener_callback_doa,
+            PLOT_QOS,
         )
 
         # for error calculations
         self.source_direction_deg = None
-        self.error_list = []
+        self.error_sum = 0.0
+        self.error_count = 0
+        self.last_error_log = -np.inf
         self.ground_truth_synch = TopicSynchronizer(20)
         self.subscription = self.create_subscription(
             GroundTruth,
@@ -124,7 +155,7 @@ class GeometryPlotter(Node):
     def init_plotter(self, name, xlabel="x", ylabel="y", equal=True):
         if not (name in self.plotter_dict.keys()):
             self.plotter_dict[name] = LivePlotter(
-                np.inf, -np.inf, label=name, log=False
+                np.inf, -np.inf, label=name, log=False, blit=True
             )
             self.plotter_dict[name].ax.set_xlabel(xlabel)
             self.plotter_dict[name].ax.set_ylabel(ylabel)
@@ -133,6 +164,21 @@ class GeometryPlotter(Node):
             self.plotter_dict[name].ax.grid()
             # plot_room(self.plotter_dict[name].ax)
             # plot_source(self.plotter_dict[name].ax)
+            self.n_legend_labels[name] = 0
+
+    def draw_plotter(self, name):
+        """ Redraw the figure of name. """
+        # the legend is part of the blitted background, so we only recreate
+        # it (and the background) when scatters or arrows were added.
+        plotter = self.plotter_dict[name]
+        n_labels = (
+            len(plotter.scatter) + len(plotter.arrows) + len(plotter.arrow_collections)
+        )
+        if n_labels != self.n_legend_labels[name]:
+            plotter.ax.legend(loc="upper right")
+            plotter.background = None
+            self.n_legend_labels[name] = n_labels
+        plotter.draw()
 
     def update_plotter(
         self, name, pose_dict, yaw_deg=False, source_direction_deg=None,
@@ -153,8 +199,7 @@ class GeometryPlotter(Node):
             self.plotter_dict[name].update_arrow(
                 latest_pose[:2], source_direction_deg, label="source direction"
             )
-        self.plotter_dict[name].ax.legend(loc="upper right")
-        self.plotter_dict[name].fig.canvas.draw()
+        self.draw_plotter(name)
         self.plotter_dict[name].reset_xlim()
         self.plotter_dict[name].reset_ylim()
 
@@ -177,20 +222,19 @@ class GeometryPlotter(Node):
             pose_imu = get_latest_pose(self.pose_dict["imu"]) + [*delta_pos, delta_yaw]
 
             add_pose(self.pose_dict["imu"], pose_imu, time=timestamp)
-            self.update_plotter(
-                "pose imu", self.pose_dict["imu"], yaw_deg=True,
-            )
+            self.pending_updates["pose imu"] = self.pose_dict["imu"]
 
         if PLOT_RAW:
             pose_raw = [*r_world[:2], yaw]
             add_pose(self.pose_dict["raw"], pose_raw, time=timestamp)
-            self.update_plotter(
-                "pose raw", self.pose_dict["raw"], yaw_deg=True,
-            )
+            self.pending_updates["pose raw"] = self.pose_dict["raw"]
 
     def listener_callback_pose(self, msg_pose):
         """Plot the latest poses."""
-        new_position, yaw, pitch, roll = read_pose_message(msg_pose)
+        if self.pose_checked:
+            new_position, yaw = read_planar_pose_message(msg_pose)
+        else:
+            new_position, yaw, pitch, roll = read_pose_message(msg_pose)
         if new_position[2] < Z_THRESHOLD_M:
             return
 
@@ -199,24 +243,36 @@ class GeometryPlotter(Node):
             self.pose_dict["pose"]["start_time"] = timestamp
         timestamp = timestamp - self.pose_dict["pose"]["start_time"]
 
-        assert pitch == 0, pitch
-        assert roll == 0, roll
+        # the poses are planar, which is only checked on the first message.
+        if not self.pose_checked:
+            assert pitch == 0, pitch
+            assert roll == 0, roll
+            self.pose_checked = True
         add_pose(self.pose_dict["pose"], [*new_position[:2], yaw], time=timestamp)
 
-        self.update_plotter("pose", self.pose_dict["pose"], yaw_deg=True)
+        self.pending_updates["pose"] = self.pose_dict["pose"]
+
+    def plot_callback(self):
+        """Update the figures with the data received since the last call."""
+        for name, pose_dict in self.pending_updates.items():
+            self.update_plotter(name, pose_dict, yaw_deg=True)
+        self.pending_updates = {}
+
+        if self.doa_estimates is not None:
+            self.init_plotter("position", xlabel=XLABEL, ylabel=YLABEL)
+            latest_pose = get_latest_pose(self.pose_dict["pose"])
+            self.plotter_dict["pose"].update_arrows(
+                latest_pose[:2], self.doa_estimates, label="doa"
+            )
+            self.draw_plotter("pose")
+            self.doa_estimates = None
 
     def listener_callback_doa(self, msg_doa):
         """Plot the estimated DOA directions on the most recent pose."""
-        self.init_plotter("position", xlabel=XLABEL, ylabel=YLABEL)
-
         doa_estimates = list(msg_doa.doa_estimates_deg)
 
-        for i, doa_estimate in enumerate(doa_estimates):
-            latest_pose = get_latest_pose(self.pose_dict["pose"])
-            self.plotter_dict["pose"].update_arrow(
-                latest_pose[:2], doa_estimate, label=f"doa {i}"
-            )
-            self.plotter_dict["pose"].fig.canvas.draw()
+        if len(doa_estimates):
+            self.doa_estimates = doa_estimates
 
         # calculate the current error
         message = self.ground_truth_synch.get_latest_message(
@@ -227,11 +283,15 @@ class GeometryPlotter(Node):
 
         if self.source_direction_deg is not None:
             error = abs(self.source_direction_deg - doa_estimates[0])
-            self.error_list.append(error)
-            avg_error = np.mean(self.error_list)
-            self.get_logger().info(
-                f"Current error: {error}, current average: {avg_error}"
-            )
+            self.error_sum += error
+            self.error_count += 1
+            now = time.monotonic()
+            if now - self.last_error_log >= ERROR_LOG_PERIOD_S:
+                self.last_error_log = now
+                avg_error = self.error_sum / self.error_count
+                self.get_logger().info(
+                    f"Current error: {error}, current average: {avg_error}"
+                )
 
 
 def main(args=None):
@@ -7,6 +7,7 @@ live_plotter.py: live data plotting using matplotlib.
 import math
 
 import matplotlib
+from matplotlib.collections import LineCollection
 import matplotlib.pylab as plt
 import numpy as np
 
@@ -43,6 +44,7 @@ class LivePlotter(object):
         min_xlim=MIN_XLIM,
         ax=None,
         fig=None,
+        blit=False,
     ):
         self.max_ylim = max_ylim
         self.min_ylim = min_ylim
@@ -53,6 +55,12 @@ class LivePlotter(object):
 
         self.log = log
 
+        # if blit is set, the lines, scatters and arrows are animated and only they
+        # are redrawn in draw(), on top of a saved background.
+        self.blit = blit
+        self.background = None
+        self.background_lims = None
+
         if (fig is None) and (ax is None):
             self.fig, self.ax = plt.subplots()
         else:
@@ -65,6 +73,7 @@ class LivePlotter(object):
         self.lines = {}
         self.axvlines = {}
         self.arrows = {}
+        self.arrow_collections = {}
         self.scatter = {}
 
         self.mesh = None
@@ -84,12 +93,41 @@ class LivePlotter(object):
         # TODO(FD) this is not called when we resize
         # the figure, need to figure out why.
         self.fig.canvas.draw()
+        self.background = None
 
     def clear(self):
         for i in range(len(self.ax.lines)):
             self.ax.lines.pop()
         self.lines = {}
         self.axvlines = {}
+        self.background = None
+
+    def draw(self):
+        """ Draw the figure. With blitting, only the lines, scatters and arrows are
+        redrawn, unless the axis limits changed since the background was saved.
+        """
+        if not self.blit:
+            self.fig.canvas.draw()
+            return
+
+        lims = (self.ax.get_xlim(), self.ax.get_ylim())
+        if (self.background is None) or (lims != self.background_lims):
+            self.fig.canvas.draw()
+            self.background = self.fig.canvas.copy_from_bbox(self.ax.bbox)
+            self.background_lims = lims
+        else:
+            self.fig.canvas.restore_region(self.background)
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+        for line in self.scatter.values():
+            self.ax.draw_artist(line)
+        for arrow in self.arrows.values():
+            self.ax.draw_artist(arrow["pointer"])
+            self.ax.draw_artist(arrow["line"])
+        for collection in self.arrow_collections.values():
+            self.ax.draw_artist(collection)
+        self.fig.canvas.blit(self.ax.bbox)
+        self.fig.canvas.flush_events()
 
     def update_arrow(self, origin, angle_deg, label=None):
         """ Update arrow coordinates. 
@@ -109,7 +147,11 @@ class LivePlotter(object):
         else:
             self.arrows[label] = {}
             (line,) = self.ax.plot(
-                origin_x + dx, origin_y + dy, marker=">", color=f"C{len(self.arrows)-1}"
+                origin_x + dx,
+                origin_y + dy,
+                marker=">",
+                color=f"C{len(self.arrows)-1}",
+                animated=self.blit,
             )
             self.arrows[label]["pointer"] = line
             (line,) = self.ax.plot(
@@ -117,9 +159,34 @@ class LivePlotter(object):
                 [origin_y, origin_y + dy],
                 label=label,
                 color=f"C{len(self.arrows)-1}",
+                animated=self.blit,
             )
             self.arrows[label]["line"] = line
 
+    def update_arrows(self, origin, angles_deg, label=None):
+        """ Update arrows of all angles, starting at the same origin, as one collection.
+        """
+        xmin, xmax = self.ax.get_xlim()
+        arrow_length = (xmax - xmin) / 5
+
+        angles_rad = np.asarray(angles_deg, dtype=float) * math.pi / 180
+        segments = np.empty((len(angles_rad), 2, 2))
+        segments[:, 0, :] = origin
+        segments[:, 1, 0] = origin[0] + arrow_length * np.cos(angles_rad)
+        segments[:, 1, 1] = origin[1] + arrow_length * np.sin(angles_rad)
+
+        if label in self.arrow_collections.keys():
+            self.arrow_collections[label].set_segments(segments)
+        else:
+            collection = LineCollection(
+                segments,
+                colors=[f"C{i % 10}" for i in range(len(segments))],
+                label=label,
+                animated=self.blit,
+            )
+            self.ax.add_collection(collection)
+            self.arrow_collections[label] = collection
+
     def update_lines(self, row_matrix, x_data=None, labels=None, **kwargs):
         """ Plot each row of row_matrix as one line.
         """
@@ -142,6 +209,7 @@ class LivePlotter(object):
                         row_matrix[i, :],
                         color=f"C{i % 10}",
                         label=label,
+                        animated=self.blit,
                         **kwargs,
                     )
                 else:
@@ -150,6 +218,7 @@ class LivePlotter(object):
                         row_matrix[i, :],
                         color=f"C{i % 10}",
                         label=label,
+                        animated=self.blit,
                         **kwargs,
                     )
                 self.lines[i] = line
@@ -252,7 +321,13 @@ class LivePlotter(object):
 
         else:
             (line,) = self.ax.plot(
-                x_data, y_data, label=label, linestyle="", marker="o", **kwargs
+                x_data,
+                y_data,
+                label=label,
+                linestyle="",
+                marker="o",
+                animated=self.blit,
+                **kwargs,
             )
             self.scatter[label] = line
 
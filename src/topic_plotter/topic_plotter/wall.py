@@ -97,7 +97,8 @@ class WallApproachPlotter(Node):
                 self.plotter_dict[i].ax.scatter(
                     xdata, ydata[i], color=color, label=label
                 )
-            self.plotter_dict[0].ax.legend(loc="upper left")
+            if label is not None:
+                self.plotter_dict[0].ax.legend(loc="upper left")
         else:
             self.get_logger().warn(
                 f"No valid signals message for pose {timestamp}"